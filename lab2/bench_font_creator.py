@@ -0,0 +1,62 @@
+import os
+import random
+import tempfile
+import time
+
+from PIL import Image
+
+from font_creator import parse, parse_bulk, parse_many
+
+
+def make_atlas(file_path: str, letter_width: int, letter_height: int, letters: int, letters_gap=1) -> None:
+	"""
+	Writes a random black-and-white atlas in the layout parse() expects
+	"""
+	width = letters * (letter_width + letters_gap) - letters_gap
+	img = Image.new("RGBA", (width, letter_height), (255, 255, 255, 255))
+	rnd = random.Random(letters)
+	img.putdata([
+		(0, 0, 0, 255) if rnd.random() < 0.5 else (255, 255, 255, 255)
+		for _ in range(width * letter_height)
+	])
+	img.save(file_path)
+
+
+def measure(func, *args, repeat: int = 3) -> float:
+	best = float("inf")
+	for _ in range(repeat):
+		start = time.perf_counter()
+		func(*args)
+		best = min(best, time.perf_counter() - start)
+	return best
+
+
+def compare(title: str, img_path: str, letter_width: int, alphabet: list[str]) -> None:
+	assert parse(img_path, letter_width, alphabet, 1) == parse_bulk(img_path, letter_width, alphabet, 1)
+	slow = measure(parse, img_path, letter_width, alphabet, 1)
+	fast = measure(parse_bulk, img_path, letter_width, alphabet, 1)
+	print(f"{title:<28} getpixel {slow * 1000:9.2f} ms   bulk {fast * 1000:8.2f} ms   x{slow / fast:.1f}")
+
+
+if __name__ == "__main__":
+	alphabet_en = [chr(ord('a') + i) for i in range(26)]
+	compare("5x7_letters_en.png", "5x7_letters_en.png", 5, alphabet_en)
+	compare("7x11_letters_en.png", "7x11_letters_en.png", 7, alphabet_en)
+
+	with tempfile.TemporaryDirectory() as tmp:
+		jobs = []
+		for i, (letter_width, letter_height, letters) in enumerate([(16, 24, 512), (32, 48, 1024), (32, 48, 1024), (32, 48, 1024)]):
+			path = os.path.join(tmp, f"atlas_{i}.png")
+			make_atlas(path, letter_width, letter_height, letters)
+			jobs.append((path, letter_width, [chr(0x4E00 + k) for k in range(letters)], 1))
+
+		for path, letter_width, alphabet, _ in jobs[:2]:
+			compare(f"random {letter_width}px x {len(alphabet)}", path, letter_width, alphabet)
+
+		sequential = measure(lambda: [parse_bulk(*job) for job in jobs], repeat=1)
+		parallel = measure(lambda: parse_many(jobs, max_workers=max(2, os.cpu_count() or 1), pool_threshold=0), repeat=1)
+		auto = measure(parse_many, jobs, repeat=1)
+		print(
+			f"{len(jobs)} atlases sequential {sequential * 1000:.2f} ms   process pool {parallel * 1000:.2f} ms"
+			f"   parse_many {auto * 1000:.2f} ms ({os.cpu_count()} CPU)"
+		)
@@ -0,0 +1,124 @@
+import argparse
+import contextlib
+import io
+import os
+import string
+import sys
+import threading
+import time
+
+from main import AnsiColors, ConsolePrinter, FontRegistry, RenderCounters
+
+FONTS: list[tuple[str, str]] = [
+	("3x5", "fontConfig_3x5.json"),
+	("5x7", "fontConfig.json"),
+	("7x11", "fontConfig_7x11.json"),
+	("7x11 packed", "fontConfig_7x11.cpf"),
+]
+
+
+class CountingSink(io.RawIOBase):
+	"""
+	Raw sink that counts write calls reaching it, i.e. the write syscalls a real terminal would get
+	"""
+	def __init__(self, fd: int | None = None):
+		self._fd = fd
+		self.writes = 0
+		self.bytes = 0
+
+	def writable(self) -> bool:
+		return True
+
+	def write(self, b) -> int:
+		self.writes += 1
+		self.bytes += len(b)
+		if self._fd is not None:
+			return os.write(self._fd, b)
+		return len(b)
+
+
+@contextlib.contextmanager
+def sink(use_pty: bool):
+	"""
+	Redirects stdout into a null sink or into the slave side of a pty drained by a thread
+	"""
+	if not use_pty:
+		raw = CountingSink()
+		with contextlib.redirect_stdout(io.TextIOWrapper(io.BufferedWriter(raw), encoding="utf-8")):
+			yield raw
+		return
+
+	# pty is POSIX only, imported here so the null sink works on Windows too
+	import pty
+	master, slave = pty.openpty()
+	stop = threading.Event()
+
+	def drain():
+		while not stop.is_set():
+			try:
+				os.read(master, 65536)
+			except OSError:
+				return
+
+	reader = threading.Thread(target=drain, daemon=True)
+	reader.start()
+	raw = CountingSink(slave)
+	try:
+		with contextlib.redirect_stdout(io.TextIOWrapper(io.BufferedWriter(raw), encoding="utf-8")):
+			yield raw
+	finally:
+		stop.set()
+		os.close(slave)
+		os.close(master)
+
+
+def font_load_time(path: str, repeat: int = 20) -> tuple[float, float]:
+	"""
+	:return: (cold load, cached load) in seconds
+	"""
+	cold = float("inf")
+	for _ in range(repeat):
+		FontRegistry.clear()
+		start = time.perf_counter()
+		FontRegistry.get(path)
+		cold = min(cold, time.perf_counter() - start)
+
+	start = time.perf_counter()
+	for _ in range(repeat):
+		FontRegistry.get(path)
+	return cold, (time.perf_counter() - start) / repeat
+
+
+def bench_font(title: str, path: str, frames: int, use_pty: bool) -> None:
+	text = string.ascii_lowercase
+	counters = RenderCounters()
+	with sink(use_pty) as raw:
+		with ConsolePrinter(path, AnsiColors.BRIGHT_WHITE, (0, 0), '*', counters=counters) as printer:
+			writes_before = raw.writes
+			start = time.perf_counter()
+			for i in range(frames):
+				# rotate the text so every frame changes and the diff cannot skip it
+				shift = i % len(text)
+				printer.print(text[shift:] + text[:shift])
+			elapsed = time.perf_counter() - start
+			writes = raw.writes - writes_before
+
+	cold, cached = font_load_time(path)
+	glyphs = counters.glyphs
+	print(
+		f"{title:<12} {glyphs / elapsed:12.0f} glyphs/s"
+		f" {counters.bytes / glyphs:8.1f} B/glyph"
+		f" {writes / max(counters.frames, 1):6.2f} writes/frame"
+		f" load {cold * 1000:7.3f} ms (cached {cached * 1e6:6.2f} us)"
+	)
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="ConsolePrinter render benchmark")
+	parser.add_argument("--frames", type=int, default=500)
+	parser.add_argument("--pty", action="store_true", help="write into a pseudo terminal instead of a null sink (POSIX only)")
+	args = parser.parse_args()
+
+	print(f"sink: {'pty' if args.pty else 'null'}, frames: {args.frames}", file=sys.stderr)
+	for title, path in FONTS:
+		bench_font(title, path, args.frames, args.pty)
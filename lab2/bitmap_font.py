@@ -0,0 +1,133 @@
+import bisect
+import mmap
+import os
+import stat
+import struct
+import tempfile
+
+# file layout (little endian):
+#   header: magic, font width, font height, glyph count
+#   index:  (code point, data offset, row count) per glyph, sorted by code point
+#   data:   one bitmask per glyph row, leftmost pixel in the highest bit
+_MAGIC: bytes = b"CPF1"
+_HEADER = struct.Struct("<4sHHI")
+_INDEX_ENTRY = struct.Struct("<IIH")
+
+
+def _row_bytes(width: int) -> int:
+	return (width + 7) // 8
+
+
+def write_font(file_path: str, letters: dict[str, list[str]], font_width: int, font_height: int) -> None:
+	"""
+	:param file_path: path to the binary font file
+	:param letters: letter -> rows of '*' (filled) and '_' (blank) as in the json font config
+	:param font_width: width of a glyph
+	:param font_height: height of a glyph
+	"""
+	row_bytes = _row_bytes(font_width)
+	index: list[tuple[int, int, int]] = []
+	data = bytearray()
+	for letter in sorted(letters, key=ord):
+		rows = letters[letter]
+		index.append((ord(letter), len(data), len(rows)))
+		for line in rows:
+			bits = 0
+			for char in line[:font_width]:
+				bits = (bits << 1) | (char == "*")
+			bits <<= row_bytes * 8 - min(len(line), font_width)
+			data += bits.to_bytes(row_bytes, "big")
+
+	# written next to the target and swapped in: an open BitmapFont keeps mapping the old file,
+	# rewriting it in place would change the bytes under it (or fail while it is mapped on Windows)
+	fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(file_path) + ".", dir=os.path.dirname(os.path.abspath(file_path)))
+	try:
+		with os.fdopen(fd, "wb") as f:
+			f.write(_HEADER.pack(_MAGIC, font_width, font_height, len(index)))
+			for entry in index:
+				f.write(_INDEX_ENTRY.pack(*entry))
+			f.write(data)
+		try:
+			mode = stat.S_IMODE(os.stat(file_path).st_mode)
+		except FileNotFoundError:
+			mode = 0o644
+		os.chmod(temp_path, mode)
+		os.replace(temp_path, file_path)
+	except BaseException:
+		os.remove(temp_path)
+		raise
+
+
+class BitmapFont:
+	"""
+	Read-only font in the packed bitmap format. The file is memory-mapped and glyphs are decoded
+	on first use, so it can be used in place of the letters dict of a json font config
+	"""
+	def __init__(self, file_path: str):
+		self._file = None
+		self._data = None
+		self._glyphs: dict[str, list[str]] = {}
+		f = open(file_path, "rb")
+		try:
+			self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		except Exception as e:
+			f.close()
+			raise e
+		self._file = f
+
+		magic, self.font_width, self.font_height, self._count = _HEADER.unpack_from(self._data, 0)
+		if magic != _MAGIC:
+			self.close()
+			raise ValueError(f"{file_path} is not a bitmap font file")
+		self._row_bytes = _row_bytes(self.font_width)
+		self._data_start = _HEADER.size + self._count * _INDEX_ENTRY.size
+
+	def __del__(self):
+		self.close()
+
+	def close(self) -> None:
+		if self._data is not None:
+			self._data.close()
+			self._data = None
+		if self._file is not None:
+			self._file.close()
+			self._file = None
+
+	def __len__(self) -> int:
+		return self._count
+
+	def __contains__(self, letter: str) -> bool:
+		return self.get(letter) is not None
+
+	def _code_point(self, i: int) -> int:
+		return _INDEX_ENTRY.unpack_from(self._data, _HEADER.size + i * _INDEX_ENTRY.size)[0]
+
+	def _decode(self, offset: int, rows: int) -> list[str]:
+		start = self._data_start + offset
+		width = self.font_width
+		shift = self._row_bytes * 8 - width
+		lines: list[str] = []
+		for i in range(rows):
+			row_start = start + i * self._row_bytes
+			bits = int.from_bytes(self._data[row_start:row_start + self._row_bytes], "big") >> shift
+			lines.append(format(bits, f"0{width}b").replace("0", "_").replace("1", "*"))
+		return lines
+
+	def get(self, letter: str, default: list[str] | None = None) -> list[str] | None:
+		glyph = self._glyphs.get(letter)
+		if glyph is not None:
+			return glyph
+		if len(letter) != 1:
+			return default
+
+		code_point = ord(letter)
+		i = bisect.bisect_left(range(self._count), code_point, key=self._code_point)
+		if i == self._count:
+			return default
+		found, offset, rows = _INDEX_ENTRY.unpack_from(self._data, _HEADER.size + i * _INDEX_ENTRY.size)
+		if found != code_point:
+			return default
+
+		glyph = self._decode(offset, rows)
+		self._glyphs[letter] = glyph
+		return glyph
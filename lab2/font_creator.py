@@ -1,8 +1,13 @@
 import json
+import os
+from concurrent.futures import ProcessPoolExecutor
 
+import numpy as np
 from PIL import Image
 import string
 
+from bitmap_font import write_font
+
 def parse(img_path: str, letter_width: int, alphabet: list[str], letters_gap=1) -> dict[str, list[str]]:
 	# from left to right
 	# then from top to bottom
@@ -30,27 +35,96 @@ def parse(img_path: str, letter_width: int, alphabet: list[str], letters_gap=1)
 	return answer
 
 
+def parse_bulk(img_path: str, letter_width: int, alphabet: list[str], letters_gap=1) -> dict[str, list[str]]:
+	"""
+	Same result as parse(), but the image buffer is read at once and all glyphs are sliced with array operations
+	"""
+	with Image.open(img_path) as img:
+		rgba = img.convert("RGBA")
+		width, height = rgba.size
+		pixels = np.frombuffer(rgba.tobytes(), dtype=np.uint8).reshape(height, width, 4)
 
-alphabet_en = list(string.ascii_lowercase)
-a = parse('5x7_letters_en.png', 5, alphabet_en, 1)
-# print(a)
-print(json.dumps(a))
-
-alphabet_ru = list("абвгдеёжзийклмнопрстуфхцчшщъыьэюя")
-b = parse('5x7_letters_ru.png', 5, alphabet_ru, 1)
-print(json.dumps(b))
-
-digits = list("0123456789")
-c = parse('5x7_letters_digits.png', 5, digits, 1)
-print(json.dumps(c))
+	filled = np.all(pixels == (0, 0, 0, 255), axis=2)
+	starts = np.arange(len(alphabet)) * (letter_width + letters_gap)
+	columns = starts[:, None] + np.arange(letter_width)
+	if columns.size and columns[-1, -1] >= width:
+		raise IndexError("image index out of range")
 
-symbols = list("!?#$%^&*()_+-÷/\\@")
-d = parse('5x7_letters_symbols.png', 5, symbols, 1)
-print(json.dumps(d))
+	# (letter, row, column)
+	glyphs = filled[:, columns].transpose(1, 0, 2)
+	rows = np.where(glyphs, ord('*'), ord('_')).astype(np.uint8).tobytes().decode("ascii")
 
-e = parse('3x5_letters_en.png', 3, alphabet_en, 1)
-print(json.dumps(e))
+	answer: dict[str, list[str]] = dict()
+	letter_size = letter_width * height
+	for k, letter in enumerate(alphabet):
+		letter_rows = rows[k * letter_size:(k + 1) * letter_size]
+		answer[letter] = [letter_rows[y:y + letter_width] for y in range(0, letter_size, letter_width)]
+	return answer
 
-f = parse('7x11_letters_en.png', 7, alphabet_en, 1)
-print(json.dumps(f))
 
+def _parse_job(job: tuple[str, int, list[str], int]) -> dict[str, list[str]]:
+	return parse_bulk(*job)
+
+
+def parse_many(
+		jobs: list[tuple[str, int, list[str], int]],
+		max_workers: int | None = None,
+		pool_threshold: int = 1_000_000,
+) -> list[dict[str, list[str]]]:
+	"""
+	Parses several atlases with parse_bulk(), in parallel when it pays off.
+	Starting the process pool costs about as much as parsing a million pixels, so the atlases are parsed
+	sequentially if there is one job or one worker (CPU) or they have fewer than pool_threshold pixels in total
+
+	:param jobs: (img_path, letter_width, alphabet, letters_gap) for every atlas
+	:param max_workers: size of the process pool, number of CPUs by default
+	:param pool_threshold: min total number of pixels to use the process pool
+	:return: parsed letters in the order of jobs
+	"""
+	workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+	if workers < 2 or _pixels(jobs) < pool_threshold:
+		return [parse_bulk(*job) for job in jobs]
+	with ProcessPoolExecutor(max_workers=workers) as executor:
+		return list(executor.map(_parse_job, jobs))
+
+
+def _pixels(jobs: list[tuple[str, int, list[str], int]]) -> int:
+	total = 0
+	for img_path, *_ in jobs:
+		# only the header is read here
+		with Image.open(img_path) as img:
+			width, height = img.size
+		total += width * height
+	return total
+
+
+def export_binary(path_to_font_config: str, path_to_binary_font: str) -> None:
+	"""
+	Converts a json font config into the packed bitmap format (.cpf)
+	"""
+	with open(path_to_font_config, "r", encoding="utf-8") as f:
+		cfg = json.load(f)
+	write_font(path_to_binary_font, cfg.get("letters", {}), cfg.get("font_width"), cfg.get("font_height"))
+
+
+
+if __name__ == "__main__":
+	alphabet_en = list(string.ascii_lowercase)
+	alphabet_ru = list("абвгдеёжзийклмнопрстуфхцчшщъыьэюя")
+	digits = list("0123456789")
+	symbols = list("!?#$%^&*()_+-÷/\\@")
+
+	atlases = parse_many([
+		('5x7_letters_en.png', 5, alphabet_en, 1),
+		('5x7_letters_ru.png', 5, alphabet_ru, 1),
+		('5x7_letters_digits.png', 5, digits, 1),
+		('5x7_letters_symbols.png', 5, symbols, 1),
+		('3x5_letters_en.png', 3, alphabet_en, 1),
+		('7x11_letters_en.png', 7, alphabet_en, 1),
+	])
+	for letters in atlases:
+		print(json.dumps(letters))
+
+	export_binary('fontConfig.json', 'fontConfig.cpf')
+	export_binary('fontConfig_3x5.json', 'fontConfig_3x5.cpf')
+	export_binary('fontConfig_7x11.json', 'fontConfig_7x11.cpf')
@@ -1,15 +1,254 @@
 # lab2
 import json
+import os
+import sys
+import threading
 import time
+from collections import OrderedDict
 from enum import Enum
 
+from bitmap_font import BitmapFont
+
+
+class FrameBuffer:
+	"""
+	Off-screen cell grid: cells are collected in memory and rendered into a single string.
+	The last rendered state is kept, so only changed cells are written again
+	"""
+	_CURSOR_POSITION: str = "\033[{row};{col}H"
+
+	def __init__(self):
+		self._cells: dict[tuple[int, int], tuple[AnsiColors, str]] = {}
+		self._screen: dict[tuple[int, int], tuple[AnsiColors, str]] = {}
+
+	def __len__(self) -> int:
+		return len(self._cells)
+
+	def draw(self, row: int, col: int, color: AnsiColors, symbol: str) -> None:
+		self._cells[(row, col)] = (color, symbol)
+
+	def stamp(self, row: int, col: int, glyph: tuple[tuple[tuple[AnsiColors, str], ...], ...]) -> None:
+		"""
+		:param glyph: pre-rendered rows of (color, symbol) cells, placed with (row, col) as the top left corner
+		"""
+		cells = self._cells
+		for i, line in enumerate(glyph):
+			for j, cell in enumerate(line):
+				cells[(row + i, col + j)] = cell
+
+	def clear(self) -> None:
+		self._cells.clear()
+
+	def invalidate(self) -> None:
+		"""
+		Forgets the rendered state, the next render() repaints every cell
+		"""
+		self._screen.clear()
+
+	def render(self) -> tuple[str, list[tuple[tuple[int, int], AnsiColors, str]]]:
+		"""
+		The cells stay pending until commit(), so a failed write does not lose them
+
+		:return: escape sequences for pending cells that differ from the screen and these cells
+		"""
+		changed: list[tuple[tuple[int, int], AnsiColors, str]] = []
+		screen = self._screen
+		for cell, (color, symbol) in sorted(self._cells.items()):
+			if screen.get(cell) == (color, symbol):
+				continue
+			changed.append((cell, color, symbol))
+		return self._encode(changed), changed
+
+	def commit(self, changed: list[tuple[tuple[int, int], AnsiColors, str]]) -> None:
+		"""
+		Records the cells returned by render() as shown once they are written and clears the buffer
+		"""
+		screen = self._screen
+		for cell, color, symbol in changed:
+			screen[cell] = (color, symbol)
+		self._cells.clear()
+
+	@classmethod
+	def _encode(cls, cells: list[tuple[tuple[int, int], AnsiColors, str]]) -> str:
+		"""
+		Merges horizontal runs: the cursor is moved only when it is not already at the cell
+		and the color is switched only when it differs from the previous cell
+
+		:param cells: ((row, column), color, symbol) sorted by position
+		"""
+		chunks: list[str] = []
+		cursor: tuple[int, int] | None = None
+		current_color: AnsiColors | None = None
+		for (row, col), color, symbol in cells:
+			if (row, col) != cursor:
+				chunks.append(cls._CURSOR_POSITION.format(row=row + 1, col=col + 1))
+			if color is not current_color:
+				chunks.append(color.value)
+				current_color = color
+			chunks.append(symbol)
+			cursor = (row, col + 1)
+		if chunks:
+			chunks.append(AnsiColors.RESET.value)
+		return "".join(chunks)
+
+
+class GlyphCache:
+	"""
+	Bounded LRU cache of pre-rendered glyphs keyed by (font, letter, color, symbol)
+	"""
+	def __init__(self, maxsize: int = 1024):
+		if maxsize < 1:
+			raise ValueError("Cache size must be positive")
+		self._maxsize = maxsize
+		self._glyphs: OrderedDict[tuple, tuple[tuple[tuple[AnsiColors, str], ...], ...]] = OrderedDict()
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+
+	def __len__(self) -> int:
+		return len(self._glyphs)
+
+	def get(self, key: tuple) -> tuple[tuple[tuple[AnsiColors, str], ...], ...] | None:
+		with self._lock:
+			glyph = self._glyphs.get(key)
+			if glyph is None:
+				self.misses += 1
+				return None
+			self._glyphs.move_to_end(key)
+			self.hits += 1
+			return glyph
+
+	def put(self, key: tuple, glyph: tuple[tuple[tuple[AnsiColors, str], ...], ...]) -> None:
+		with self._lock:
+			self._glyphs[key] = glyph
+			self._glyphs.move_to_end(key)
+			if len(self._glyphs) > self._maxsize:
+				self._glyphs.popitem(last=False)
+
+	def clear(self) -> None:
+		with self._lock:
+			self._glyphs.clear()
+			self.hits = 0
+			self.misses = 0
+
+	def info(self) -> dict[str, int]:
+		return {"hits": self.hits, "misses": self.misses, "size": len(self._glyphs), "maxsize": self._maxsize}
+
+
+class Font:
+	def __init__(self, letters, font_width: int, font_height: int, key: tuple[str, int]):
+		"""
+		:param letters: letter -> rows of '*' and '_' (dict or BitmapFont)
+		:param key: (absolute path, mtime) of the file the font was loaded from
+		"""
+		self.letters = letters
+		self.font_width = font_width
+		self.font_height = font_height
+		self.key = key
+
+
+class FontRegistry:
+	"""
+	Process-wide fonts shared by all printers: a font file is parsed once and loaded again only when it changes
+	"""
+	_fonts: dict[str, Font] = {}
+	_lock = threading.Lock()
+
+	@classmethod
+	def get(cls, file_path: str) -> Font:
+		path = os.path.abspath(file_path)
+		mtime = os.stat(path).st_mtime_ns
+		with cls._lock:
+			font = cls._fonts.get(path)
+			if font is None or font.key[1] != mtime:
+				font = cls._load(path, mtime)
+				cls._fonts[path] = font
+			return font
+
+	@classmethod
+	def clear(cls) -> None:
+		with cls._lock:
+			cls._fonts.clear()
+
+	@staticmethod
+	def _load(file_path: str, mtime: int) -> Font:
+		if file_path.endswith(".cpf"):
+			font = BitmapFont(file_path)
+			return Font(font, font.font_width, font.font_height, (file_path, mtime))
+
+		try:
+			with open(file_path, "r", encoding="utf-8") as f:
+				cfg = json.load(f)
+				return Font(cfg.get("letters", {}), cfg.get("font_width"), cfg.get("font_height"), (file_path, mtime))
+		except FileNotFoundError as e:
+			raise e
+		except json.JSONDecodeError as e:
+			raise e
+		except Exception as e:
+			raise e
+
+
+class RenderCounters:
+	"""
+	Optional counters hook for ConsolePrinter, accumulated over all prints of the printers it is passed to.
+	Writes reaching the terminal are not visible here, count them at the output stream (see bench_render.py)
+	"""
+	def __init__(self):
+		self.glyphs = 0
+		self.frames = 0
+		self.bytes = 0
+		self.font_loads = 0
+		self.font_load_time = 0.0
+
+	def reset(self) -> None:
+		self.__init__()
+
+	def snapshot(self) -> dict[str, int | float]:
+		return {
+			"glyphs": self.glyphs,
+			"frames": self.frames,
+			"bytes": self.bytes,
+			"font_loads": self.font_loads,
+			"font_load_time": self.font_load_time,
+		}
+
 
 class ConsolePrinter:
 	_NEW_CANVAS: str = "\033[?1049h"
 	_BACK_TO_OLD_CANVAS: str = "\033[?1049l"
+	_glyph_cache: GlyphCache = GlyphCache()
+	_static_printers: dict[str, ConsolePrinter] = {}
 
-	def __init__(self, path_to_font_config, color: AnsiColors, position: tuple[int, int], symbol: str):
+	def __init__(
+			self,
+			path_to_font_config,
+			color: AnsiColors,
+			position: tuple[int, int],
+			symbol: str,
+			buffered: bool = False,
+			background: bool = False,
+			counters: RenderCounters | None = None
+	):
+		"""
+		:param buffered: if True, print() only draws into the frame buffer, use flush() to show it
+		:param background: if True, print() only queues the text and a writer thread draws it;
+			a newer print() to the same position replaces a queued one
+		:param counters: if set, glyphs, frames, bytes and font load time are counted into it
+		"""
+		self._counters = counters
+		self._frame = FrameBuffer()
+		self._buffered = buffered
+		self._pending: OrderedDict[tuple[int, int], tuple[str, AnsiColors, tuple[int, int], str]] = OrderedDict()
+		self._queue_cond = threading.Condition()
+		self._writer: threading.Thread | None = None
+		self._writer_busy = False
+		self._writer_stop = False
+		# first exception raised while drawing on the writer thread, raised again by flush()
+		self._writer_error: Exception | None = None
+		self.rendered_frames = 0
+		self.dropped_frames = 0
 		self._font = None
+		self._font_key = None
 		self._font_width = None
 		self._font_height = None
 		self._load_font(path_to_font_config)
@@ -17,20 +256,22 @@ class ConsolePrinter:
 		self._position = position
 		self._symbol = symbol
 		self.new_canvas()
+		if background:
+			self._writer = threading.Thread(target=self._writer_loop, name="ConsolePrinterWriter", daemon=True)
+			self._writer.start()
 
 	def _load_font(self, file_path: str) -> None:
-		try:
-			with open(file_path, "r", encoding="utf-8") as f:
-				cfg = json.load(f)
-				self._font = cfg.get("letters", {})
-				self._font_width = cfg.get("font_width")
-				self._font_height = cfg.get("font_height")
-		except FileNotFoundError as e:
-			raise e
-		except json.JSONDecodeError as e:
-			raise e
-		except Exception as e:
-			raise e
+		if self._counters is not None:
+			start = time.perf_counter()
+			font = FontRegistry.get(file_path)
+			self._counters.font_loads += 1
+			self._counters.font_load_time += time.perf_counter() - start
+		else:
+			font = FontRegistry.get(file_path)
+		self._font = font.letters
+		self._font_width = font.font_width
+		self._font_height = font.font_height
+		self._font_key = font.key
 
 	@staticmethod
 	def new_canvas() -> None:
@@ -42,25 +283,111 @@ class ConsolePrinter:
 
 	def __enter__(self):
 		self.new_canvas()
+		self._frame.invalidate()
 		return self
 
 	def __exit__(self, exc_type, exc_val, exc_tb):
-		self.close_canvas()
+		try:
+			self.stop_writer()
+			self.flush()
+		finally:
+			self.close_canvas()
 
-	@staticmethod
-	def _draw_pixel(row: int, col: int, color: AnsiColors, symbol: str):
-		pos = f"\033[{row+1};{col+1}H"
-		print(f"{color.value}{pos}{symbol}{AnsiColors.RESET.value}", end='', flush=True)
+	def flush(self) -> None:
+		"""
+		Writes the changes of the frame to the terminal in one write.
+		With the background writer waits until the queued texts are drawn
+		and raises the first error the writer hit since the last flush()
+		"""
+		if self._writer is not None:
+			with self._queue_cond:
+				self._queue_cond.wait_for(lambda: not self._pending and not self._writer_busy)
+		else:
+			self._write_frame()
+		with self._queue_cond:
+			error, self._writer_error = self._writer_error, None
+		if error is not None:
+			raise error
 
-	def _print_letter(self, letter: str, position: tuple[int, int], color: AnsiColors, symbol: str) -> None:
+	def _write_frame(self) -> None:
+		data, changed = self._frame.render()
+		if data:
+			sys.stdout.write(data)
+			sys.stdout.flush()
+			if self._counters is not None:
+				self._counters.frames += 1
+				self._counters.bytes += len(data.encode("utf-8"))
+		self._frame.commit(changed)
+
+	def stop_writer(self) -> None:
+		"""
+		Draws the queued texts and stops the background writer
+		"""
+		if self._writer is None:
+			return
+		with self._queue_cond:
+			self._writer_stop = True
+			self._queue_cond.notify_all()
+		self._writer.join()
+		self._writer = None
+
+	def queue_stats(self) -> dict[str, int]:
+		"""
+		:return: current queue depth, drawn frames and frames replaced by newer ones before they were drawn
+		"""
+		with self._queue_cond:
+			return {"depth": len(self._pending), "rendered": self.rendered_frames, "dropped": self.dropped_frames}
+
+	def _writer_loop(self) -> None:
+		while True:
+			with self._queue_cond:
+				self._queue_cond.wait_for(lambda: self._pending or self._writer_stop)
+				if not self._pending:
+					return
+				requests = list(self._pending.values())
+				self._pending.clear()
+				self._writer_busy = True
+
+			# a failing request is skipped, the writer keeps running so flush() never waits for a dead thread
+			try:
+				for text, color, position, symbol in requests:
+					try:
+						self._draw_text(text, color, position, symbol)
+					except Exception as e:
+						self._record_writer_error(e)
+				try:
+					self._write_frame()
+				except Exception as e:
+					self._record_writer_error(e)
+			finally:
+				with self._queue_cond:
+					self.rendered_frames += len(requests)
+					self._writer_busy = False
+					self._queue_cond.notify_all()
+
+	def _record_writer_error(self, error: Exception) -> None:
+		with self._queue_cond:
+			if self._writer_error is None:
+				self._writer_error = error
+
+	def _render_glyph(self, letter: str, color: AnsiColors, symbol: str) -> tuple[tuple[tuple[AnsiColors, str], ...], ...]:
 		char_template = self._font.get(letter, [])
-		row, col = position
-		for i, line in enumerate(char_template):
-			for j, char in enumerate(line):
-				if char == "*":
-					self._draw_pixel(row + i, col + j, color, symbol)
-				else:
-					self._draw_pixel(row + i, col + j, AnsiColors.BLACK, ' ')
+		filled = (color, symbol)
+		blank = (AnsiColors.BLACK, ' ')
+		return tuple(
+			tuple(filled if char == "*" else blank for char in line)
+			for line in char_template
+		)
+
+	def _print_letter(self, letter: str, position: tuple[int, int], color: AnsiColors, symbol: str) -> None:
+		key = (self._font_key, letter, color, symbol)
+		glyph = self._glyph_cache.get(key)
+		if glyph is None:
+			glyph = self._render_glyph(letter, color, symbol)
+			self._glyph_cache.put(key, glyph)
+		self._frame.stamp(position[0], position[1], glyph)
+		if self._counters is not None:
+			self._counters.glyphs += 1
 
 	def print(
 			self,
@@ -85,6 +412,20 @@ class ConsolePrinter:
 		if len(symbol) != 1:
 			raise ValueError("Symbol must be a single character")
 
+		if self._writer is not None:
+			with self._queue_cond:
+				if position in self._pending:
+					self.dropped_frames += 1
+					del self._pending[position]
+				self._pending[position] = (text, color, position, symbol)
+				self._queue_cond.notify_all()
+			return
+
+		self._draw_text(text, color, position, symbol)
+		if not self._buffered:
+			self.flush()
+
+	def _draw_text(self, text: str, color: AnsiColors, position: tuple[int, int], symbol: str) -> None:
 		i, j = 0, 0
 		for letter in text:
 			if letter == '\n':
@@ -112,13 +453,26 @@ class ConsolePrinter:
 		:param position: (row, column)
 		:param symbol: the symbol that will be used to display the text (only one character)
 		"""
-		printer = cls(path_to_font_config, color, position, symbol)
-		printer.print(text)
+		printer = cls._static_printers.get(path_to_font_config)
+		if printer is None:
+			printer = cls(path_to_font_config, color, position, symbol)
+			cls._static_printers[path_to_font_config] = printer
+		else:
+			printer._load_font(path_to_font_config)
+		printer.print(text, color, position, symbol)
 
 	@classmethod
 	def close_canvas_static(cls):
+		cls._static_printers.clear()
 		cls.close_canvas()
 
+	@classmethod
+	def glyph_cache_info(cls) -> dict[str, int]:
+		"""
+		:return: hits, misses, size and maxsize of the shared glyph cache
+		"""
+		return cls._glyph_cache.info()
+
 
 class AnsiColors(Enum):
 	RESET = "\033[0m"
@@ -145,22 +499,39 @@ class AnsiColors(Enum):
 	BG_RED = "\033[41m"
 
 
-with ConsolePrinter('fontConfig.json', AnsiColors.BRIGHT_WHITE, (10, 10), '*') as p:
-	p.print('012345679')
+if __name__ == "__main__":
+	with ConsolePrinter('fontConfig.json', AnsiColors.BRIGHT_WHITE, (10, 10), '*') as p:
+		p.print('012345679')
+		time.sleep(2)
+
+	ConsolePrinter.print_static('fontConfig.json', '!@#$%^&*()_+-/', AnsiColors.BRIGHT_YELLOW, (10, 10), '*')
 	time.sleep(2)
+	ConsolePrinter.close_canvas_static()
 
-ConsolePrinter.print_static('fontConfig.json', '!@#$%^&*()_+-/', AnsiColors.BRIGHT_YELLOW, (10, 10), '*')
-time.sleep(2)
-ConsolePrinter.close_canvas_static()
+	with ConsolePrinter('fontConfig.json', AnsiColors.BRIGHT_CYAN, (10, 10), '*') as p:
+		p.print('привет мир!')
+		time.sleep(2)
 
-with ConsolePrinter('fontConfig.json', AnsiColors.BRIGHT_CYAN, (10, 10), '*') as p:
-	p.print('привет мир!')
-	time.sleep(2)
+	with ConsolePrinter('fontConfig.json', AnsiColors.BRIGHT_GREEN, (10, 10), '*', buffered=True) as p:
+		p.print('buffered')
+		p.print('frame', position=(18, 10))
+		p.flush()
+		time.sleep(2)
 
-with ConsolePrinter('fontConfig_3x5.json', AnsiColors.BRIGHT_CYAN, (10, 10), '*') as p:
-	p.print('hello world')
-	time.sleep(2)
+	with ConsolePrinter('fontConfig.json', AnsiColors.BRIGHT_RED, (10, 10), '*', background=True) as p:
+		for second in range(3, 0, -1):
+			for _ in range(100):
+				p.print(f'wait {second}')
+			time.sleep(1)
 
-with ConsolePrinter('fontConfig_7x11.json', AnsiColors.BRIGHT_CYAN, (0, 0), '*') as p:
-	p.print('hello\nworld')
-	time.sleep(2)
+	with ConsolePrinter('fontConfig_3x5.json', AnsiColors.BRIGHT_CYAN, (10, 10), '*') as p:
+		p.print('hello world')
+		time.sleep(2)
+
+	with ConsolePrinter('fontConfig_7x11.json', AnsiColors.BRIGHT_CYAN, (0, 0), '*') as p:
+		p.print('hello\nworld')
+		time.sleep(2)
+
+	with ConsolePrinter('fontConfig_7x11.cpf', AnsiColors.BRIGHT_MAGENTA, (0, 0), '*') as p:
+		p.print('packed\nfont')
+		time.sleep(2)
@@ -0,0 +1,104 @@
+import argparse
+import os
+import socket
+import tempfile
+import threading
+import time
+
+from log import (
+	FileLogHandler, Formatter, ILogHandler, LatencyHistogram, LevelFilter, Logger, LogLevel, ReLLogFilter,
+	SocketHandler
+)
+
+
+class NullHandler(ILogHandler):
+	def handle(self, log_level: LogLevel, text: str) -> None:
+		pass
+
+
+class StandInServer:
+	"""
+	Local stand-in for the log collector: accepts connections and discards everything it receives
+	"""
+	def __init__(self):
+		self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		self._socket.bind(("localhost", 0))
+		self._socket.listen()
+		self.port = self._socket.getsockname()[1]
+		self.bytes = 0
+		threading.Thread(target=self._accept_loop, daemon=True).start()
+
+	def _accept_loop(self) -> None:
+		while True:
+			try:
+				conn, _ = self._socket.accept()
+			except OSError:
+				return
+			threading.Thread(target=self._drain, args=(conn,), daemon=True).start()
+
+	def _drain(self, conn: socket.socket) -> None:
+		with conn:
+			while data := conn.recv(65536):
+				self.bytes += len(data)
+
+	def close(self) -> None:
+		self._socket.close()
+
+
+# (level, message) mix: mostly DEBUG noise, some INFO, few WARNING/ERROR
+MIX: list[tuple[LogLevel, str]] = (
+	[(LogLevel.DEBUG, "cache miss for key user:%d")] * 12
+	+ [(LogLevel.INFO, "request %d served in 12 ms")] * 6
+	+ [(LogLevel.WARNING, "slow query %d took 640 ms")] * 1
+	+ [(LogLevel.ERROR, "request %d failed: connection reset")] * 1
+)
+
+
+def run(title: str, logger: Logger, records: int) -> None:
+	latency = LatencyHistogram()
+	start = time.perf_counter()
+	for i in range(records):
+		log_level, template = MIX[i % len(MIX)]
+		call_start = time.perf_counter_ns()
+		logger.log(log_level, template, i)
+		latency.add(time.perf_counter_ns() - call_start)
+	logger.close()
+	elapsed = time.perf_counter() - start
+
+	print(f"{title}")
+	print(f"  {records / elapsed:12.0f} rec/s   log() p50 {latency.percentile(50)} ns   p99 {latency.percentile(99)} ns")
+	stats = logger.get_stats()
+	print(f"  passed {stats['passed']} of {stats['records']} records past the level gate")
+	for stage in ("filter", "format"):
+		s = stats[stage]
+		print(f"  {stage:<24} mean {s['mean_ns']:9.0f} ns   p99 {s['p99_ns']:9d} ns")
+	for name, s in stats["handlers"].items():
+		print(f"  {name:<24} mean {s['mean_ns']:9.0f} ns   p99 {s['p99_ns']:9d} ns")
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Logger throughput and per-stage latency")
+	parser.add_argument("--records", type=int, default=200000)
+	args = parser.parse_args()
+
+	server = StandInServer()
+	with tempfile.TemporaryDirectory() as tmp:
+		log_path = os.path.join(tmp, "bench.log")
+		error_pattern = r".*(failed|slow)"
+		scenarios = [
+			("level filter + formatter -> null", lambda: Logger(
+				LevelFilter(LogLevel.INFO), Formatter(), NullHandler(), stats=True)),
+			("level filter + formatter -> file", lambda: Logger(
+				LevelFilter(LogLevel.INFO), Formatter(), FileLogHandler(log_path), stats=True)),
+			("level + regex filter + formatter -> file", lambda: Logger(
+				[LevelFilter(LogLevel.DEBUG), ReLLogFilter(error_pattern)], Formatter(), FileLogHandler(log_path), stats=True)),
+			("level filter + formatter -> file + socket", lambda: Logger(
+				LevelFilter(LogLevel.INFO), Formatter(),
+				[FileLogHandler(log_path), SocketHandler("localhost", server.port)], stats=True)),
+			("queued: level filter + formatter -> file + socket", lambda: Logger(
+				LevelFilter(LogLevel.INFO), Formatter(),
+				[FileLogHandler(log_path), SocketHandler("localhost", server.port)], stats=True, queue_size=10000)),
+		]
+		for title, make_logger in scenarios:
+			run(title, make_logger(), args.records)
+	server.close()
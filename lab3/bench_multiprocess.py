@@ -0,0 +1,98 @@
+import argparse
+import functools
+import multiprocessing
+import os
+import tempfile
+import time
+
+from log import FileLogHandler, ILogHandler, LevelFilter, Logger, LogLevel
+from mp_log import LogCollector, ProcessLogHandler
+
+
+class NullHandler(ILogHandler):
+	def handle(self, log_level: LogLevel, text: str) -> None:
+		pass
+
+
+def per_record_ns(logger: Logger, records: int) -> float:
+	start = time.perf_counter_ns()
+	for i in range(records):
+		logger.log_info("worker message %d", i)
+	return (time.perf_counter_ns() - start) / records
+
+
+def file_handlers(file_path: str):
+	return [FileLogHandler(file_path, flush_interval=0)]
+
+
+def worker(queue, number: int, records: int, results) -> None:
+	logger = Logger(LevelFilter(LogLevel.INFO), [], ProcessLogHandler(queue))
+	start = time.perf_counter_ns()
+	for i in range(records):
+		logger.log_info("%d %d", number, i)
+	logger.close()
+	results.put((time.perf_counter_ns() - start) / records)
+
+
+def worker_to_file(file_path: str, number: int, records: int, results) -> None:
+	logger = Logger(LevelFilter(LogLevel.INFO), [], FileLogHandler(file_path, buffer_size=0, flush_interval=0))
+	start = time.perf_counter_ns()
+	for i in range(records):
+		logger.log_info("%d %d", number, i)
+	logger.close()
+	results.put((time.perf_counter_ns() - start) / records)
+
+
+def check_order(file_path: str, workers: int, records: int) -> bool:
+	last = [-1] * workers
+	count = 0
+	with open(file_path, "r", encoding="utf-8") as f:
+		for line in f:
+			number, i = map(int, line.split())
+			if i != last[number] + 1:
+				return False
+			last[number] = i
+			count += 1
+	return count == workers * records
+
+
+def run_workers(target, first_arg, workers: int, records: int) -> tuple[float, float]:
+	"""
+	:return: (mean per-record ns in workers, wall time in s)
+	"""
+	results = multiprocessing.Queue()
+	start = time.perf_counter()
+	processes = [multiprocessing.Process(target=target, args=(first_arg, n, records, results)) for n in range(workers)]
+	for process in processes:
+		process.start()
+	per_record = [results.get() for _ in processes]
+	for process in processes:
+		process.join()
+	return sum(per_record) / workers, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Per-record cost of multi-process logging")
+	parser.add_argument("--workers", type=int, default=4)
+	parser.add_argument("--records", type=int, default=50000, help="records per worker")
+	args = parser.parse_args()
+
+	print(f"in-process null handler     {per_record_ns(Logger(LevelFilter(LogLevel.INFO), [], NullHandler()), args.records):8.0f} ns/record")
+
+	with tempfile.TemporaryDirectory() as tmp:
+		shared = os.path.join(tmp, "shared.log")
+		per_record, elapsed = run_workers(worker_to_file, shared, args.workers, args.records)
+		print(f"workers -> same file        {per_record:8.0f} ns/record in workers, {elapsed:.2f} s total")
+
+		collected = os.path.join(tmp, "collected.log")
+		start = time.perf_counter()
+		# a partial of a module level function can be pickled, so any start method works
+		collector = LogCollector(functools.partial(file_handlers, collected))
+		collector.start()
+		per_record, _ = run_workers(worker, collector.queue, args.workers, args.records)
+		collector.stop()
+		elapsed = time.perf_counter() - start
+		print(
+			f"workers -> collector        {per_record:8.0f} ns/record in workers, {elapsed:.2f} s total,"
+			f" order kept: {check_order(collected, args.workers, args.records)}"
+		)
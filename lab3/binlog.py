@@ -0,0 +1,343 @@
+import argparse
+import datetime
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from typing import Iterator
+
+from log import ILogHandler, LogLevel, _open_handlers, _start_flusher
+
+# data file: magic, then records of (message length, level, unix time in ns) followed by the utf-8 message
+# index file (<data file>.idx): one entry per block of records
+#   (block offset, min time, max time, mask of levels in the block, number of records)
+_MAGIC: bytes = b"BLG1"
+_RECORD = struct.Struct("<IBq")
+_INDEX_ENTRY = struct.Struct("<QqqHI")
+
+_LEVEL_BITS: dict[LogLevel, int] = {level: 1 << i for i, level in enumerate(LogLevel)}
+_LEVELS_BY_VALUE: dict[int, LogLevel] = {level.value: level for level in LogLevel}
+
+TIME_FORMAT: str = "%Y.%m.%d %H:%M:%S"
+
+
+def _index_path(file_path: str) -> str:
+	return file_path + ".idx"
+
+
+def _level_mask(levels: list[LogLevel] | None) -> int:
+	if levels is None:
+		return (1 << len(LogLevel)) - 1
+	mask = 0
+	for level in levels:
+		mask |= _LEVEL_BITS[level]
+	return mask
+
+
+class BinaryLogHandler(ILogHandler):
+	"""
+	Writes records in the binary structured format and a sparse index with one entry per index_every records.
+	Records are buffered until the buffer reaches buffer_size bytes or for at most flush_interval seconds
+	"""
+	def __init__(self, file_path: str, index_every: int = 256, buffer_size: int = 64 * 1024, flush_interval: float = 1.0):
+		self._file_path = file_path
+		self._index_every = index_every
+		self._buffer_size = buffer_size
+		self._lock = threading.Lock()
+		self._buffer = bytearray()
+		self._index_buffer = bytearray()
+
+		is_new = not os.path.exists(file_path) or os.path.getsize(file_path) == 0
+		self._start_block()
+		if not is_new:
+			self._index_tail()
+		self._file = open(file_path, "ab")
+		self._index_file = open(_index_path(file_path), "ab")
+		if is_new:
+			# written at once, so even a file without records is recognized by the reader
+			self._file.write(_MAGIC)
+			self._file.flush()
+		self._offset = self._file.tell()
+
+		self._stop = threading.Event()
+		if flush_interval > 0:
+			_start_flusher(self, self._stop, flush_interval)
+		_open_handlers.add(self)
+
+	def __del__(self):
+		if getattr(self, '_file', None) is not None:
+			self.close()
+
+	def _index_tail(self) -> None:
+		"""
+		Adds index entries for the records a writer that was not closed appended after the last index entry,
+		otherwise they would end up between indexed blocks and never be found by queries.
+		A record that was only partly written is cut off
+		"""
+		index_path = _index_path(self._file_path)
+		offset, skip = len(_MAGIC), 0
+		if os.path.exists(index_path):
+			with open(index_path, "rb+") as f:
+				index = f.read()
+				usable = len(index) - len(index) % _INDEX_ENTRY.size
+				if usable != len(index):
+					f.truncate(usable)
+			if usable:
+				offset, _, _, _, skip = _INDEX_ENTRY.unpack_from(index, usable - _INDEX_ENTRY.size)
+
+		with open(self._file_path, "rb+") as f:
+			f.seek(offset)
+			tail = f.read()
+			position = 0
+			while position + _RECORD.size <= len(tail):
+				length, level, timestamp = _RECORD.unpack_from(tail, position)
+				if position + _RECORD.size + length > len(tail):
+					break
+				if skip:
+					skip -= 1
+				else:
+					self._add_to_block(offset + position, _LEVELS_BY_VALUE[level], timestamp)
+				position += _RECORD.size + length
+			if position != len(tail):
+				f.truncate(offset + position)
+
+	def _start_block(self) -> None:
+		self._block_offset = 0
+		self._block_min = None
+		self._block_max = None
+		self._block_mask = 0
+		self._block_count = 0
+
+	def _end_block(self) -> None:
+		if self._block_count:
+			self._index_buffer += _INDEX_ENTRY.pack(
+				self._block_offset, self._block_min, self._block_max, self._block_mask, self._block_count
+			)
+		self._start_block()
+
+	def handle(self, log_level: LogLevel, text: str) -> None:
+		self.handle_batch([(log_level, text)])
+
+	def handle_batch(self, records: list[tuple[LogLevel, str]]) -> None:
+		with self._lock:
+			timestamp = time.time_ns()
+			for log_level, text in records:
+				self._append(log_level, timestamp, text)
+			if len(self._buffer) >= self._buffer_size:
+				self._write()
+
+	def write_record(self, log_level: LogLevel, timestamp: int, text: str) -> None:
+		"""
+		Appends a record with an explicit unix time in ns
+		"""
+		with self._lock:
+			self._append(log_level, timestamp, text)
+			if len(self._buffer) >= self._buffer_size:
+				self._write()
+
+	def _append(self, log_level: LogLevel, timestamp: int, text: str) -> None:
+		message = text.encode("utf-8")
+		self._add_to_block(self._offset + len(self._buffer), log_level, timestamp)
+		self._buffer += _RECORD.pack(len(message), log_level.value, timestamp)
+		self._buffer += message
+
+	def _add_to_block(self, offset: int, log_level: LogLevel, timestamp: int) -> None:
+		if not self._block_count:
+			self._block_offset = offset
+		if self._block_min is None or timestamp < self._block_min:
+			self._block_min = timestamp
+		if self._block_max is None or timestamp > self._block_max:
+			self._block_max = timestamp
+		self._block_mask |= _LEVEL_BITS[log_level]
+		self._block_count += 1
+		if self._block_count >= self._index_every:
+			self._end_block()
+
+	def _write(self) -> None:
+		# records first, so an index entry never points past the end of the data file
+		if self._buffer:
+			self._file.write(self._buffer)
+			self._file.flush()
+			self._offset += len(self._buffer)
+			self._buffer.clear()
+		if self._index_buffer:
+			self._index_file.write(self._index_buffer)
+			self._index_file.flush()
+			self._index_buffer.clear()
+
+	def flush(self) -> None:
+		with self._lock:
+			if self._file is not None:
+				self._write()
+
+	def close(self) -> None:
+		self._stop.set()
+		_open_handlers.discard(self)
+		with self._lock:
+			if self._file is None:
+				return
+			self._end_block()
+			self._write()
+			self._file.close()
+			self._index_file.close()
+			self._file = None
+			self._index_file = None
+
+
+class BinaryLogReader:
+	"""
+	Memory-maps a binary log and answers time range and level queries using its sparse index:
+	only blocks whose time range and levels can match are decoded
+	"""
+	def __init__(self, file_path: str):
+		self._file = open(file_path, "rb")
+		if os.fstat(self._file.fileno()).st_size < len(_MAGIC):
+			self._file.close()
+			raise ValueError(f"{file_path} is not a binary log file")
+		self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+		if self._data[:len(_MAGIC)] != _MAGIC:
+			self.close()
+			raise ValueError(f"{file_path} is not a binary log file")
+
+		self._blocks: list[tuple[int, int, int, int, int]] = []
+		if os.path.exists(_index_path(file_path)):
+			with open(_index_path(file_path), "rb") as f:
+				index = f.read()
+			usable = len(index) - len(index) % _INDEX_ENTRY.size
+			self._blocks = [entry for entry in _INDEX_ENTRY.iter_unpack(index[:usable]) if entry[0] < len(self._data)]
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.close()
+
+	def close(self) -> None:
+		self._data.close()
+		self._file.close()
+
+	def _records(self, offset: int, count: int | None) -> Iterator[tuple[LogLevel, int, str]]:
+		data = self._data
+		end = len(data)
+		read = 0
+		while offset + _RECORD.size <= end and (count is None or read < count):
+			length, level, timestamp = _RECORD.unpack_from(data, offset)
+			offset += _RECORD.size
+			if offset + length > end:
+				return
+			yield _LEVELS_BY_VALUE[level], timestamp, data[offset:offset + length].decode("utf-8")
+			offset += length
+			read += 1
+
+	def _unindexed_offset(self) -> int:
+		if not self._blocks:
+			return len(_MAGIC)
+		# skip the last indexed block record by record to find where unindexed records start
+		offset, _, _, _, count = self._blocks[-1]
+		data = self._data
+		for _ in range(count):
+			length = _RECORD.unpack_from(data, offset)[0]
+			offset += _RECORD.size + length
+		return offset
+
+	def query(
+			self,
+			start: int | None = None,
+			end: int | None = None,
+			levels: list[LogLevel] | None = None,
+	) -> Iterator[tuple[LogLevel, int, str]]:
+		"""
+		:param start: min unix time in ns (inclusive)
+		:param end: max unix time in ns (inclusive)
+		:param levels: levels to return, all by default
+		:return: (level, unix time in ns, message) in file order
+		"""
+		mask = _level_mask(levels)
+
+		def wanted(log_level: LogLevel, timestamp: int) -> bool:
+			return (
+				_LEVEL_BITS[log_level] & mask
+				and (start is None or timestamp >= start)
+				and (end is None or timestamp <= end)
+			)
+
+		for offset, block_min, block_max, block_mask, count in self._blocks:
+			if not block_mask & mask:
+				continue
+			if start is not None and block_max < start:
+				continue
+			if end is not None and block_min > end:
+				continue
+			for record in self._records(offset, count):
+				if wanted(record[0], record[1]):
+					yield record
+
+		# records after the last index entry (the writer was not closed cleanly)
+		for record in self._records(self._unindexed_offset(), None):
+			if wanted(record[0], record[1]):
+				yield record
+
+
+def _parse_time(value: str) -> int:
+	return int(datetime.datetime.strptime(value, TIME_FORMAT).timestamp() * 1_000_000_000)
+
+
+_TEXT_RECORD = re.compile(r"^\[(\w+)\] \[(\d{4}\.\d{2}\.\d{2} \d{2}:\d{2}:\d{2})\] (.*)$")
+
+
+def convert_text_log(text_path: str, binary_path: str, index_every: int = 256) -> int:
+	"""
+	Converts a log written with Formatter ([<level>] [<yyyy.MM.dd hh:mm:ss>] <text>) into the binary format.
+	Lines that do not start a record are appended to the previous message
+
+	:return: number of converted records
+	"""
+	handler = BinaryLogHandler(binary_path, index_every)
+	converted = 0
+	pending: tuple[LogLevel, int, str] | None = None
+	try:
+		with open(text_path, "r", encoding="utf-8") as f:
+			for line in f:
+				line = line.rstrip("\n")
+				match = _TEXT_RECORD.match(line)
+				if match is None or match.group(1) not in LogLevel.__members__:
+					if pending is not None:
+						pending = (pending[0], pending[1], f"{pending[2]}\n{line}")
+					continue
+				if pending is not None:
+					handler.write_record(*pending)
+					converted += 1
+				pending = (LogLevel[match.group(1)], _parse_time(match.group(2)), match.group(3))
+		if pending is not None:
+			handler.write_record(*pending)
+			converted += 1
+	finally:
+		handler.close()
+	return converted
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Binary structured logs")
+	commands = parser.add_subparsers(dest="command", required=True)
+
+	convert = commands.add_parser("convert", help="convert a text log into the binary format")
+	convert.add_argument("text_log")
+	convert.add_argument("binary_log")
+
+	query = commands.add_parser("query", help="print records of a binary log")
+	query.add_argument("binary_log")
+	query.add_argument("--level", action="append", choices=list(LogLevel.__members__))
+	query.add_argument("--start", type=_parse_time, help=TIME_FORMAT)
+	query.add_argument("--end", type=_parse_time, help=TIME_FORMAT)
+
+	args = parser.parse_args()
+	if args.command == "convert":
+		print(f"{convert_text_log(args.text_log, args.binary_log)} records converted")
+	else:
+		levels = None if args.level is None else [LogLevel[name] for name in args.level]
+		with BinaryLogReader(args.binary_log) as reader:
+			for log_level, timestamp, text in reader.query(args.start, args.end, levels):
+				moment = datetime.datetime.fromtimestamp(timestamp / 1_000_000_000).strftime(TIME_FORMAT)
+				print(f"[{log_level.name}] [{moment}] {text}")
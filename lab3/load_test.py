@@ -0,0 +1,59 @@
+import argparse
+import asyncio
+import struct
+import time
+
+from socket_server import HOST, PORT, raise_open_files_limit
+
+_LENGTH = struct.Struct(">I")
+
+
+async def producer(host: str, port: int, number: int, records: int, batch: int, framing: str) -> int:
+	"""
+	One simulated SocketHandler: sends records in frames of batch records
+	:return: bytes sent
+	"""
+	reader, writer = await asyncio.open_connection(host, port)
+	sent = 0
+	for start in range(0, records, batch):
+		frame = bytearray()
+		for i in range(start, min(start + batch, records)):
+			payload = f"[INFO] [producer {number}] record {i}".encode("utf-8")
+			if framing == "newline":
+				frame += payload + b"\n"
+			else:
+				frame += _LENGTH.pack(len(payload)) + payload
+		writer.write(frame)
+		await writer.drain()
+		sent += len(frame)
+	writer.close()
+	await writer.wait_closed()
+	return sent
+
+
+async def run(args) -> None:
+	start = time.perf_counter()
+	sent = await asyncio.gather(*[
+		producer(args.host, args.port, i, args.records, args.batch, args.framing)
+		for i in range(args.producers)
+	])
+	elapsed = time.perf_counter() - start
+	total = args.producers * args.records
+	print(
+		f"{args.producers} producers, {total} records, {sum(sent)} bytes in {elapsed:.2f} s:"
+		f" {total / elapsed:.0f} rec/s, {sum(sent) / elapsed / 1024 / 1024:.1f} MiB/s"
+	)
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Drives socket_server.py with many simulated producers")
+	parser.add_argument("--host", default=HOST)
+	parser.add_argument("--port", type=int, default=PORT)
+	parser.add_argument("--producers", type=int, default=1000)
+	parser.add_argument("--records", type=int, default=1000, help="records per producer")
+	parser.add_argument("--batch", type=int, default=64, help="records per frame")
+	parser.add_argument("--framing", choices=["newline", "length"], default="newline")
+	args = parser.parse_args()
+
+	raise_open_files_limit()
+	asyncio.run(run(args))
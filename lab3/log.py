@@ -1,9 +1,20 @@
+import atexit
 import datetime
+import functools
+import gzip
+import os
+import random
 import re
+import shutil
+import threading
+import weakref
 from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
 from enum import Enum
+from typing import Callable
 import platform
 import socket
+import time
 
 class LogLevel(Enum):
 	DEBUG = 0
@@ -13,12 +24,25 @@ class LogLevel(Enum):
 
 
 class ILogFilter(ABC):
+	# relative cost of match(), Logger runs cheaper filters first
+	cost: int = 2
+	# True if match() depends on the level only, such filters run before the message text is built
+	level_only: bool = False
+
 	@abstractmethod
 	def match(self, log_level: LogLevel, text: str) -> bool:
 		pass
 
+	def flush(self) -> None:
+		"""
+		Reports records the filter holds back, called by Logger.flush() and Logger.close()
+		"""
+		pass
+
 
 class SimpleLogFilter(ILogFilter):
+	cost = 1
+
 	def __init__(self, pattern: str):
 		self._pattern = pattern
 
@@ -27,14 +51,20 @@ class SimpleLogFilter(ILogFilter):
 
 
 class ReLLogFilter(ILogFilter):
+	cost = 2
+
 	def __init__(self, re_pattern: str):
 		self._re_pattern = re_pattern
+		self._re = re.compile(re_pattern)
 
 	def match(self, log_level: LogLevel, text: str) -> bool:
-		return re.match(self._re_pattern, text) is not None
+		return self._re.match(text) is not None
 
 
 class LevelFilter(ILogFilter):
+	cost = 0
+	level_only = True
+
 	def __init__(self, level: LogLevel):
 		self._level = level
 
@@ -47,49 +77,337 @@ class ILogHandler(ABC):
 	def handle(self, log_level: LogLevel, text: str) -> None:
 		pass
 
+	def handle_batch(self, records: list[tuple[LogLevel, str]]) -> None:
+		for log_level, text in records:
+			self.handle(log_level, text)
+
+	def flush(self) -> None:
+		pass
+
+	def close(self) -> None:
+		pass
+
+
+# loggers and handlers with buffered records; the ones still open at interpreter exit are closed then,
+# loggers first so their queues are drained into the handlers, and records of a Logger that was never closed
+# are not lost
+_open_loggers: weakref.WeakSet["Logger"] = weakref.WeakSet()
+_open_handlers: weakref.WeakSet[ILogHandler] = weakref.WeakSet()
+
+
+@atexit.register
+def _close_open_handlers() -> None:
+	for logger in list(_open_loggers):
+		logger.close()
+	for handler in list(_open_handlers):
+		handler.close()
+
+
+def _start_flusher(handler: ILogHandler, stop: threading.Event, flush_interval: float) -> threading.Thread:
+	"""
+	Starts a daemon thread calling handler.flush() every flush_interval seconds until stop is set.
+	The thread holds the handler weakly, so an unused handler is still garbage collected
+	"""
+	handler_ref = weakref.ref(handler)
+
+	def flush_loop() -> None:
+		while not stop.wait(flush_interval):
+			handler = handler_ref()
+			if handler is None:
+				return
+			handler.flush()
+			del handler
+
+	flusher = threading.Thread(target=flush_loop, daemon=True)
+	flusher.start()
+	return flusher
+
 
 class FileLogHandler(ILogHandler):
-	def __init__(self, file_path: str):
+	def __init__(
+			self,
+			file_path: str,
+			buffer_size: int = 64 * 1024,
+			flush_interval: float = 1.0,
+			fsync: bool = False,
+			max_bytes: int | None = None,
+			rotate_interval: float | None = None,
+			backup_count: int = 5,
+			compress: bool = False,
+	):
+		"""
+		Records are kept in a write buffer which is written at once when it reaches buffer_size bytes
+		or every flush_interval seconds
+
+		:param fsync: if True, every buffer write is followed by one fsync for all records in it (group commit)
+		:param max_bytes: rotate when the file reaches this size
+		:param rotate_interval: rotate every rotate_interval seconds
+		:param backup_count: number of rotated files kept as file_path.1 ... file_path.<backup_count>
+		:param compress: gzip rotated files in the background
+		"""
 		self._file_path = file_path
 		self._file_descriptor = None
+		self._buffer = bytearray()
+		self._buffer_size = buffer_size
+		self._fsync = fsync
+		self._max_bytes = max_bytes
+		self._rotate_interval = rotate_interval
+		self._backup_count = backup_count
+		self._compress = compress
+		self._compressor: threading.Thread | None = None
+		self._lock = threading.RLock()
+		self._open()
+
+		self._stop = threading.Event()
+		self._flusher = None
+		if flush_interval > 0:
+			self._flusher = _start_flusher(self, self._stop, flush_interval)
+		_open_handlers.add(self)
+
+	def _open(self) -> None:
 		try:
-			f = open(self._file_path, "a")
+			f = open(self._file_path, "ab", buffering=0)
 		except PermissionError as e:
 			raise e
 		except Exception as e:
 			raise e
 		else:
 			self._file_descriptor = f
+			self._size = f.seek(0, os.SEEK_END)
+			self._rollover_at = None if self._rotate_interval is None else time.time() + self._rotate_interval
 
 	def __del__(self):
-		if self._file_descriptor is not None:
-			self._file_descriptor.close()
+		if getattr(self, '_file_descriptor', None) is not None:
+			self.close()
 
 	def handle(self, log_level: LogLevel, text: str) -> None:
-		print(text, file=self._file_descriptor)
+		self.handle_batch([(log_level, text)])
+
+	def handle_batch(self, records: list[tuple[LogLevel, str]]) -> None:
+		with self._lock:
+			for log_level, text in records:
+				self._buffer += text.encode('utf-8')
+				self._buffer += b"\n"
+			if len(self._buffer) >= self._buffer_size:
+				self._write_buffer()
+
+	def _write_buffer(self) -> None:
+		if self._buffer:
+			self._file_descriptor.write(self._buffer)
+			self._size += len(self._buffer)
+			self._buffer.clear()
+			if self._fsync:
+				os.fsync(self._file_descriptor.fileno())
+		if self._should_rotate():
+			self._rotate()
+
+	def _should_rotate(self) -> bool:
+		if self._max_bytes is not None and self._size >= self._max_bytes:
+			return True
+		return self._rollover_at is not None and time.time() >= self._rollover_at
+
+	def _backup_name(self, i: int) -> str:
+		return f"{self._file_path}.{i}"
+
+	def _rotate(self) -> None:
+		if self._compressor is not None:
+			self._compressor.join()
+			self._compressor = None
+		self._file_descriptor.close()
+		self._file_descriptor = None
+
+		if self._backup_count > 0:
+			for i in range(self._backup_count - 1, 0, -1):
+				for suffix in ("", ".gz"):
+					src = self._backup_name(i) + suffix
+					if os.path.exists(src):
+						os.replace(src, self._backup_name(i + 1) + suffix)
+			os.replace(self._file_path, self._backup_name(1))
+			if self._compress:
+				self._compressor = threading.Thread(target=self._compress_file, args=(self._backup_name(1),), daemon=True)
+				self._compressor.start()
+		else:
+			os.remove(self._file_path)
+		self._open()
+
+	@staticmethod
+	def _compress_file(file_path: str) -> None:
+		with open(file_path, "rb") as src, gzip.open(file_path + ".gz", "wb") as dst:
+			shutil.copyfileobj(src, dst)
+		os.remove(file_path)
+
+	def flush(self) -> None:
+		with self._lock:
+			if self._file_descriptor is not None:
+				self._write_buffer()
+
+	def close(self) -> None:
+		self._stop.set()
+		_open_handlers.discard(self)
+		with self._lock:
+			if self._file_descriptor is not None:
+				self._write_buffer()
+				self._file_descriptor.close()
+				self._file_descriptor = None
+		if self._compressor is not None:
+			self._compressor.join()
+			self._compressor = None
 
 
 class SocketHandler(ILogHandler):
-	def __init__(self, host: str, port: int):
+	_MAX_FRAME: int = 64 * 1024
+
+	def __init__(
+			self,
+			host: str,
+			port: int,
+			batch_size: int = 64,
+			flush_interval: float = 0.5,
+			spool_size: int = 10000,
+			reconnect_delay: float = 0.5,
+			max_reconnect_delay: float = 30.0,
+			non_blocking: bool = False,
+			connect_timeout: float = 5.0,
+			send_timeout: float = 5.0,
+	):
+		"""
+		Records are collected and sent as one frame when batch_size records are buffered
+		or every flush_interval seconds. While the collector is down records are kept in a spool
+		of spool_size records (the oldest are dropped) and the connection is retried with exponential backoff
+
+		:param non_blocking: if True, the socket never blocks the logging thread, unsent bytes wait for the next flush
+		:param connect_timeout: timeout of one connection attempt; reconnects are made by flush()
+			and the flusher thread, never by handle()
+		:param send_timeout: max time one send may block in the blocking mode (a collector that stopped reading
+			is disconnected) and max time close() spends on sending the rest, records left after it count as dropped
+		"""
 		self._host = host
 		self._port = port
-		self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-		try:
-			self._socket.connect((self._host, self._port))
-		except ConnectionError as e:
-			print(f"Warning: Could not connect to socket logger: {e}")
+		self._batch_size = batch_size
+		self._non_blocking = non_blocking
+		self._reconnect_delay = reconnect_delay
+		self._max_reconnect_delay = max_reconnect_delay
+		self._connect_timeout = connect_timeout
+		self._send_timeout = send_timeout
+		self._delay = reconnect_delay
+		self._next_connect = 0.0
+		self._lock = threading.RLock()
+		self._spool: deque[bytes] = deque()
+		self._spool_size = spool_size
+		self._outgoing = bytearray()
+		self._partial = False
+		self._socket: socket.socket | None = None
+		self._closed = False
+		self.dropped = 0
+
+		self._stop = threading.Event()
+		self._connect()
+		self._flusher = _start_flusher(self, self._stop, flush_interval)
+		_open_handlers.add(self)
 
 	def __del__(self):
-		if hasattr(self, '_socket'):
+		if getattr(self, '_socket', None) is not None:
 			self._socket.close()
 
+	def _connect(self) -> None:
+		# called without the lock: a slow connection attempt must not block handle() on other threads
+		if self._socket is not None or self._closed:
+			return
+		now = time.monotonic()
+		if now < self._next_connect:
+			return
+		try:
+			sock = socket.create_connection((self._host, self._port), timeout=self._connect_timeout)
+		except OSError as e:
+			if self._delay == self._reconnect_delay:
+				print(f"Warning: Could not connect to socket logger: {e}")
+			self._next_connect = now + self._delay
+			self._delay = min(self._delay * 2, self._max_reconnect_delay)
+			return
+		if self._non_blocking:
+			sock.setblocking(False)
+		else:
+			sock.settimeout(self._send_timeout)
+		with self._lock:
+			if self._socket is not None or self._closed:
+				sock.close()
+				return
+			self._socket = sock
+			self._delay = self._reconnect_delay
+
+	def _disconnect(self, error: Exception) -> None:
+		print(f"Socket logging error: {error}")
+		self._socket.close()
+		self._socket = None
+		self._next_connect = time.monotonic() + self._delay
+		if self._partial:
+			# the head of this record already reached the old connection, the rest is useless
+			cut = self._outgoing.find(b"\n") + 1
+			del self._outgoing[:cut]
+			self._partial = False
+			self.dropped += 1
+
+	def _send(self) -> None:
+		if self._socket is None or (not self._spool and not self._outgoing):
+			return
+		while self._spool and len(self._outgoing) < self._MAX_FRAME:
+			self._outgoing += self._spool.popleft()
+		deadline = time.monotonic() + self._send_timeout
+		try:
+			while self._outgoing:
+				if not self._non_blocking:
+					# like sendall() with a timeout, but the bytes already sent are known when it fails
+					remaining = deadline - time.monotonic()
+					if remaining <= 0:
+						raise TimeoutError("timed out")
+					self._socket.settimeout(remaining)
+				sent = self._socket.send(self._outgoing)
+				if sent:
+					# a record was cut if the last byte that left is not the end of a record
+					self._partial = self._outgoing[sent - 1] != 0x0A
+					del self._outgoing[:sent]
+		except BlockingIOError:
+			pass
+		except OSError as e:
+			self._disconnect(e)
+
 	def handle(self, log_level: LogLevel, text: str) -> None:
-		if hasattr(self, '_socket'):
-			try:
-				msg = f"{text}\n".encode('utf-8')
-				self._socket.sendall(msg)
-			except Exception as e:
-				print(f"Socket logging error: {e}")
+		self.handle_batch([(log_level, text)])
+
+	def handle_batch(self, records: list[tuple[LogLevel, str]]) -> None:
+		with self._lock:
+			for log_level, text in records:
+				if len(self._spool) >= self._spool_size:
+					self._spool.popleft()
+					self.dropped += 1
+				self._spool.append(f"{text}\n".encode('utf-8'))
+			if len(self._spool) >= self._batch_size:
+				self._send()
+
+	def flush(self) -> None:
+		self._connect()
+		with self._lock:
+			self._send()
+
+	def close(self) -> None:
+		self._stop.set()
+		_open_handlers.discard(self)
+		self._connect()
+		with self._lock:
+			# a collector that stopped reading must not keep the process from exiting
+			deadline = time.monotonic() + self._send_timeout
+			if self._socket is not None and self._non_blocking:
+				self._socket.settimeout(self._send_timeout)
+				self._non_blocking = False
+			while self._socket is not None and (self._spool or self._outgoing) and time.monotonic() < deadline:
+				self._send()
+			self.dropped += len(self._spool) + self._outgoing.count(b"\n")
+			self._spool.clear()
+			self._outgoing.clear()
+			self._closed = True
+			if self._socket is not None:
+				self._socket.close()
+				self._socket = None
 
 
 class ConsoleHandler(ILogHandler):
@@ -119,17 +437,273 @@ class ILogFormatter(ABC):
 
 
 class Formatter(ILogFormatter):
+	def __init__(self):
+		# (unix second, formatted timestamp), strftime runs once per second
+		self._timestamp: tuple[int, str] = (-1, "")
+
+	def _now(self) -> str:
+		second = int(time.time())
+		cached_second, timestamp = self._timestamp
+		if second != cached_second:
+			timestamp = datetime.datetime.fromtimestamp(second).strftime("%Y.%m.%d %H:%M:%S")
+			self._timestamp = (second, timestamp)
+		return timestamp
+
 	def format(self, log_level: LogLevel, text: str) -> str:
-		return f"[{log_level.name}] [{datetime.datetime.now().strftime("%Y.%m.%d %H:%M:%S")}] {text}"
+		return f"[{log_level.name}] [{self._now()}] {text}"
+
+
+class RateLimitFilter(ILogFilter):
+	"""
+	Token bucket per level: passes at most rate records per second with bursts of up to burst records.
+	Only records of the given level and containing the pattern are limited, all other records pass
+	"""
+	cost = 3
+
+	def __init__(self, rate: float, burst: int, level: LogLevel | None = None, pattern: str | None = None):
+		self._rate = rate
+		self._burst = burst
+		self._level = level
+		self._pattern = pattern
+		# level -> [tokens, time of the last refill]
+		self._buckets: dict[LogLevel, list[float]] = {}
+		self._lock = threading.Lock()
+		self.rejected = 0
+
+	def match(self, log_level: LogLevel, text: str) -> bool:
+		if self._level is not None and log_level is not self._level:
+			return True
+		if self._pattern is not None and self._pattern not in text:
+			return True
+
+		now = time.monotonic()
+		with self._lock:
+			bucket = self._buckets.get(log_level)
+			if bucket is None:
+				bucket = self._buckets[log_level] = [float(self._burst), now]
+			bucket[0] = min(self._burst, bucket[0] + (now - bucket[1]) * self._rate)
+			bucket[1] = now
+			if bucket[0] < 1:
+				self.rejected += 1
+				return False
+			bucket[0] -= 1
+			return True
+
+
+class SamplingFilter(ILogFilter):
+	"""
+	Passes only a random share of records of the given levels (DEBUG and INFO by default)
+	"""
+	cost = 3
+
+	def __init__(self, rate: float, levels: list[LogLevel] | None = None):
+		if not 0 <= rate <= 1:
+			raise ValueError("Rate must be between 0 and 1")
+		self._rate = rate
+		self._levels = frozenset([LogLevel.DEBUG, LogLevel.INFO] if levels is None else levels)
+		self._random = random.Random()
+
+	def match(self, log_level: LogLevel, text: str) -> bool:
+		if log_level not in self._levels:
+			return True
+		return self._random.random() < self._rate
+
+
+class DedupFilter(ILogFilter):
+	"""
+	Suppresses repeats of a message of the same level within window seconds after its first occurrence.
+	The number of suppressed repeats is reported as a record "<message> (repeated N times)" when the window
+	is over (noticed on the next logged record), when the message is evicted and on Logger.flush() / close().
+	A Logger sends these records to its handlers unless report is given.
+	At most max_entries messages are tracked, the one with the oldest window is evicted first
+	"""
+	cost = 3
+
+	def __init__(self, window: float, max_entries: int = 1024, report: Callable[[LogLevel, str], None] | None = None):
+		self._window = window
+		self._max_entries = max_entries
+		self.report = report
+		# (level, message) -> [start of its window, repeats suppressed in it], oldest window first
+		self._seen: OrderedDict[tuple[LogLevel, str], list[float]] = OrderedDict()
+		self._lock = threading.Lock()
+
+	def match(self, log_level: LogLevel, text: str) -> bool:
+		now = time.monotonic()
+		summaries: list[tuple[LogLevel, str, int]] = []
+		with self._lock:
+			seen = self._seen
+			while seen:
+				key, entry = next(iter(seen.items()))
+				if now - entry[0] < self._window:
+					break
+				del seen[key]
+				if entry[1]:
+					summaries.append((*key, int(entry[1])))
+
+			entry = seen.get((log_level, text))
+			if entry is not None:
+				entry[1] += 1
+				passed = False
+			else:
+				seen[(log_level, text)] = [now, 0]
+				if len(seen) > self._max_entries:
+					key, evicted = seen.popitem(last=False)
+					if evicted[1]:
+						summaries.append((*key, int(evicted[1])))
+				passed = True
+		# reported without the lock: the report goes through the Logger and may come back to match()
+		self._report(summaries)
+		return passed
+
+	def flush(self) -> None:
+		summaries: list[tuple[LogLevel, str, int]] = []
+		with self._lock:
+			for key, entry in self._seen.items():
+				if entry[1]:
+					summaries.append((*key, int(entry[1])))
+					entry[1] = 0
+		self._report(summaries)
+
+	def _report(self, summaries: list[tuple[LogLevel, str, int]]) -> None:
+		if self.report is None:
+			return
+		for log_level, text, repeats in summaries:
+			self.report(log_level, f"{text} (repeated {repeats} times)")
+
+
+class HandlerRoute:
+	"""
+	Binds a handler to its own filters and formatters. The filters run after the Logger filters,
+	formatters=None means the Logger formatters are used
+	"""
+	def __init__(
+			self,
+			handler: ILogHandler,
+			filters: list[ILogFilter] | ILogFilter | None = None,
+			formatters: list[ILogFormatter] | ILogFormatter | None = None,
+	):
+		if filters is None:
+			filters = []
+		if type(filters) is not list:
+			filters = [filters]
+		if formatters is not None and type(formatters) is not list:
+			formatters = [formatters]
+		self.handler = handler
+		self.filters = filters
+		self.formatters = formatters
+		self._level_enabled = {
+			level: all(f.match(level, "") for f in filters if f.level_only)
+			for level in LogLevel
+		}
+		self._filter_chain = sorted([f for f in filters if not f.level_only], key=lambda f: f.cost)
+
+	def accepts_level(self, log_level: LogLevel) -> bool:
+		return self._level_enabled[log_level]
+
+	def match(self, log_level: LogLevel, text: str) -> bool:
+		for filter in self._filter_chain:
+			if not filter.match(log_level, text):
+				return False
+		return True
+
+
+class LatencyHistogram:
+	"""
+	Latencies in ns counted in power of two buckets: bucket k holds values in [2^(k-1), 2^k)
+	"""
+	def __init__(self):
+		self.count = 0
+		self.total = 0
+		self.max = 0
+		self.buckets = [0] * 64
+
+	def add(self, ns: int, count: int = 1) -> None:
+		self.count += count
+		self.total += ns * count
+		if ns > self.max:
+			self.max = ns
+		self.buckets[min(ns.bit_length(), 63)] += count
+
+	def percentile(self, p: float) -> int:
+		"""
+		:return: upper bound of the bucket holding the p-th percentile (0 < p <= 100)
+		"""
+		if not self.count:
+			return 0
+		rank = self.count * p / 100
+		seen = 0
+		for k, n in enumerate(self.buckets):
+			seen += n
+			if seen >= rank:
+				return min(1 << k, self.max)
+		return self.max
+
+	def snapshot(self) -> dict[str, int | float]:
+		return {
+			"count": self.count,
+			"mean_ns": self.total / self.count if self.count else 0.0,
+			"p50_ns": self.percentile(50),
+			"p99_ns": self.percentile(99),
+			"max_ns": self.max,
+		}
+
+
+class LoggerStats:
+	"""
+	Per-stage counters and latencies of a Logger: filters, formatters and every handler
+	"""
+	def __init__(self, handler_names: list[str]):
+		self.records = 0
+		self.passed = 0
+		self.filter = LatencyHistogram()
+		self.format = LatencyHistogram()
+		self.handler_names = handler_names
+		self.handlers = [LatencyHistogram() for _ in handler_names]
+
+	def snapshot(self) -> dict:
+		return {
+			"records": self.records,
+			"passed": self.passed,
+			"filter": self.filter.snapshot(),
+			"format": self.format.snapshot(),
+			"handlers": {name: h.snapshot() for name, h in zip(self.handler_names, self.handlers)},
+		}
+
+
+class OverflowPolicy(Enum):
+	BLOCK = 0
+	DROP_OLDEST = 1
+	DROP_NEW = 2
 
 
 class Logger:
+	# how many records the adaptive filter chain sees between reorderings
+	_REORDER_EVERY: int = 1024
+
 	def __init__(
 			self,
 			filters: list[ILogFilter] | ILogFilter,
 			formatters: list[ILogFormatter] | ILogFormatter,
-			handlers: list[ILogHandler] | ILogHandler,
+			handlers: list[ILogHandler | HandlerRoute] | ILogHandler | HandlerRoute,
+			queue_size: int | None = None,
+			overflow: OverflowPolicy = OverflowPolicy.BLOCK,
+			workers: int = 1,
+			batch_size: int = 64,
+			adaptive_filters: bool = False,
+			stats: bool = False,
 	):
+		"""
+		:param handlers: handlers or HandlerRoute bindings of a handler with its own filters and formatters
+		:param queue_size: if set, log() only puts records into a queue of this capacity
+			and background workers pass them to the handlers
+		:param overflow: what log() does when the queue is full
+		:param workers: number of background workers, records keep their order only with one worker
+		:param batch_size: max number of records a worker takes from the queue at once
+		:param adaptive_filters: if True, checks and rejections of every filter are counted and filters
+			of the same cost are reordered so the most rejecting ones run first
+		:param stats: if True, records and latencies of filters, formatters and every handler are collected,
+			see get_stats()
+		"""
 		if type(filters) is not list:
 			filters = [filters]
 		if type(formatters) is not list:
@@ -138,23 +712,317 @@ class Logger:
 			handlers = [handlers]
 		self._filters = filters
 		self._formatters = formatters
-		self._handlers = handlers
+		self._routes = [h if isinstance(h, HandlerRoute) else HandlerRoute(h) for h in handlers]
+		self._handlers = [route.handler for route in self._routes]
+
+		# level -> (handler index, route, formatter chain, formatter chain key) of the routes accepting the level,
+		# routes with the same formatter chain share the key so each distinct format is computed once per record
+		self._dispatch: dict[LogLevel, list[tuple[int, HandlerRoute, tuple[ILogFormatter, ...], tuple[int, ...]]]] = {}
+		for level in LogLevel:
+			self._dispatch[level] = []
+			for i, route in enumerate(self._routes):
+				if route.accepts_level(level):
+					chain = tuple(self._formatters if route.formatters is None else route.formatters)
+					self._dispatch[level].append((i, route, chain, tuple(map(id, chain))))
+
+		# level-only filters are evaluated once per level, the rest run cheapest first
+		# and stop at the first rejection
+		self._level_enabled = {
+			level: bool(self._dispatch[level]) and all(f.match(level, "") for f in self._filters if f.level_only)
+			for level in LogLevel
+		}
+		self._filter_chain = sorted([f for f in self._filters if not f.level_only], key=lambda f: f.cost)
+		self._filter_stats: dict[ILogFilter, list[int]] = {filter: [0, 0] for filter in self._filter_chain}
+		self._filtered_records = 0
+		self._passes = self._passes_adaptive if adaptive_filters else self._passes_compiled
+
+		# filters producing records of their own report them through this Logger
+		for filter in self._filters:
+			if isinstance(filter, DedupFilter) and filter.report is None:
+				filter.report = self._emit
+		for i, route in enumerate(self._routes):
+			for filter in route.filters:
+				if isinstance(filter, DedupFilter) and filter.report is None:
+					filter.report = functools.partial(self._emit, route=i)
+
+		self._stats: LoggerStats | None = None
+		self._route = self._route_plain
+		if stats:
+			self._stats = LoggerStats([f"{type(h).__name__}#{i}" for i, h in enumerate(self._handlers)])
+			self._route = self._route_timed
+
+		self._queue_size = queue_size
+		self._overflow = overflow
+		self._batch_size = batch_size
+		self._records: deque[tuple[LogLevel, str]] = deque()
+		self._queue_cond = threading.Condition()
+		self._in_flight = 0
+		self._closed = False
+		self.dropped = 0
+		# records or batches lost because a filter, formatter or handler raised in a worker
+		self.errors = 0
+		self._workers: list[threading.Thread] = []
+		if queue_size is not None:
+			if queue_size < 1:
+				raise ValueError("Queue size must be positive")
+			for i in range(workers):
+				worker = threading.Thread(target=self._worker_loop, name=f"LoggerWorker-{i}", daemon=True)
+				worker.start()
+				self._workers.append(worker)
+		_open_loggers.add(self)
+
+	def _passes_compiled(self, log_level: LogLevel, text: str) -> bool:
+		for filter in self._filter_chain:
+			if not filter.match(log_level, text):
+				return False
+		return True
+
+	def _passes_adaptive(self, log_level: LogLevel, text: str) -> bool:
+		self._filtered_records += 1
+		if self._filtered_records % self._REORDER_EVERY == 0:
+			self._reorder_filters()
+		for filter in self._filter_chain:
+			stats = self._filter_stats[filter]
+			stats[0] += 1
+			if not filter.match(log_level, text):
+				stats[1] += 1
+				return False
+		return True
+
+	def _reorder_filters(self) -> None:
+		def rejection_rate(filter: ILogFilter) -> float:
+			checks, rejects = self._filter_stats[filter]
+			return rejects / checks if checks else 0.0
+
+		self._filter_chain = sorted(self._filter_chain, key=lambda f: (f.cost, -rejection_rate(f)))
+
+	def filter_stats(self) -> list[tuple[str, int, int]]:
+		"""
+		:return: (filter class, checks, rejections) in the current chain order, counted with adaptive_filters only
+		"""
+		return [(type(f).__name__, *self._filter_stats[f]) for f in self._filter_chain]
+
+	def _route_plain(self, log_level: LogLevel, text: str) -> list[tuple[int, str]]:
+		"""
+		:return: (handler index, formatted text) for every handler the record goes to
+		"""
+		if not self._passes(log_level, text):
+			return []
+		routed: list[tuple[int, str]] = []
+		formatted: dict[tuple[int, ...], str] = {}
+		for i, route, formatters, key in self._dispatch[log_level]:
+			if not route.match(log_level, text):
+				continue
+			result = formatted.get(key)
+			if result is None:
+				result = text
+				for formatter in formatters:
+					result = formatter.format(log_level, result)
+				formatted[key] = result
+			routed.append((i, result))
+		return routed
+
+	def _route_timed(self, log_level: LogLevel, text: str) -> list[tuple[int, str]]:
+		stats = self._stats
+		stats.records += 1
+		start = time.perf_counter_ns()
+		if not self._passes(log_level, text):
+			stats.filter.add(time.perf_counter_ns() - start)
+			return []
+		filter_ns = time.perf_counter_ns() - start
+		format_ns = 0
+		routed: list[tuple[int, str]] = []
+		formatted: dict[tuple[int, ...], str] = {}
+		for i, route, formatters, key in self._dispatch[log_level]:
+			start = time.perf_counter_ns()
+			matched = route.match(log_level, text)
+			filter_ns += time.perf_counter_ns() - start
+			if not matched:
+				continue
+			result = formatted.get(key)
+			if result is None:
+				start = time.perf_counter_ns()
+				result = text
+				for formatter in formatters:
+					result = formatter.format(log_level, result)
+				formatted[key] = result
+				format_ns += time.perf_counter_ns() - start
+			routed.append((i, result))
+		stats.filter.add(filter_ns)
+		if routed:
+			stats.passed += 1
+			stats.format.add(format_ns)
+		return routed
 
 	def _log(self, log_level: LogLevel, text: str) -> None:
-		if all([filter.match(log_level, text) for filter in self._filters]):
-			for formatter in self._formatters:
-				text = formatter.format(log_level, text)
-			for handler in self._handlers:
-				handler.handle(log_level, text)
+		if self._stats is None:
+			for i, formatted in self._route(log_level, text):
+				self._handlers[i].handle(log_level, formatted)
+			return
+
+		for i, formatted in self._route(log_level, text):
+			start = time.perf_counter_ns()
+			self._handlers[i].handle(log_level, formatted)
+			self._stats.handlers[i].add(time.perf_counter_ns() - start)
+
+	def _emit(self, log_level: LogLevel, text: str, route: int | None = None) -> None:
+		"""
+		Handles a record produced by a filter on the calling thread (a worker must not wait for its own queue),
+		records of a route filter go to the handler of that route only
+		"""
+		if route is None:
+			self._log(log_level, text)
+			return
+		for i, _, formatters, _ in self._dispatch[log_level]:
+			if i == route:
+				for formatter in formatters:
+					text = formatter.format(log_level, text)
+				self._handlers[i].handle(log_level, text)
+
+	def _flush_filters(self) -> None:
+		for filter in self._filters:
+			filter.flush()
+		for route in self._routes:
+			for filter in route.filters:
+				filter.flush()
+
+	def _enqueue(self, log_level: LogLevel, text: str) -> None:
+		with self._queue_cond:
+			if self._closed:
+				raise RuntimeError("Logger is closed")
+			if len(self._records) >= self._queue_size:
+				if self._overflow is OverflowPolicy.DROP_NEW:
+					self.dropped += 1
+					return
+				if self._overflow is OverflowPolicy.DROP_OLDEST:
+					self._records.popleft()
+					self.dropped += 1
+				else:
+					self._queue_cond.wait_for(lambda: len(self._records) < self._queue_size or self._closed)
+					if self._closed:
+						raise RuntimeError("Logger is closed")
+			self._records.append((log_level, text))
+			self._queue_cond.notify_all()
+
+	def _worker_loop(self) -> None:
+		while True:
+			with self._queue_cond:
+				self._queue_cond.wait_for(lambda: self._records or self._closed)
+				if not self._records:
+					return
+				batch = [self._records.popleft() for _ in range(min(self._batch_size, len(self._records)))]
+				self._in_flight += 1
+				self._queue_cond.notify_all()
+
+			# a failing filter, formatter or handler loses only its own record or batch,
+			# the worker keeps running so flush() and a full queue never wait for a dead thread
+			try:
+				records: dict[int, list[tuple[LogLevel, str]]] = {}
+				for log_level, text in batch:
+					try:
+						routed = self._route(log_level, text)
+					except Exception as e:
+						self.errors += 1
+						print(f"Logging error: {e}")
+						continue
+					for i, formatted in routed:
+						records.setdefault(i, []).append((log_level, formatted))
+				for i, handler_records in records.items():
+					start = time.perf_counter_ns()
+					try:
+						self._handlers[i].handle_batch(handler_records)
+					except Exception as e:
+						self.errors += 1
+						print(f"Logging error in {type(self._handlers[i]).__name__}: {e}")
+						continue
+					if self._stats is not None:
+						# one sample per record with the mean latency of the batch
+						elapsed = time.perf_counter_ns() - start
+						self._stats.handlers[i].add(elapsed // len(handler_records), len(handler_records))
+			finally:
+				with self._queue_cond:
+					self._in_flight -= 1
+					self._queue_cond.notify_all()
+
+	def get_stats(self) -> dict | None:
+		"""
+		:return: records seen and passed by the filters, latency histograms (count, mean, p50, p99, max in ns)
+			of the filter and format stages and of every handler; None if the Logger was created without stats
+		"""
+		if self._stats is None:
+			return None
+		return self._stats.snapshot()
+
+	def reset_stats(self) -> None:
+		if self._stats is not None:
+			self._stats = LoggerStats(self._stats.handler_names)
+
+	def flush(self) -> None:
+		"""
+		Waits until all queued records are handled and flushes the filters and the handlers
+		"""
+		if self._workers:
+			with self._queue_cond:
+				self._queue_cond.wait_for(lambda: not self._records and not self._in_flight)
+		self._flush_filters()
+		for handler in self._handlers:
+			handler.flush()
+
+	def close(self) -> None:
+		"""
+		Handles the queued records, stops the workers and closes the handlers
+		"""
+		with self._queue_cond:
+			if self._closed:
+				return
+			self._closed = True
+			self._queue_cond.notify_all()
+		_open_loggers.discard(self)
+		for worker in self._workers:
+			worker.join()
+		self._workers.clear()
+		self._flush_filters()
+		for handler in self._handlers:
+			handler.flush()
+			handler.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.close()
+
+	def is_enabled_for(self, log_level: LogLevel) -> bool:
+		return self._level_enabled[log_level]
+
+	def log(self, log_level: LogLevel, text: str | Callable[[], str], *args) -> None:
+		"""
+		:param text: message, %-style template for args or a function returning the message;
+			the message is built only if the level passes the level filters
+		:raises RuntimeError: if the Logger is closed, with or without a queue
+		"""
+		if not self._level_enabled[log_level]:
+			return
+		if callable(text):
+			text = text()
+		elif args:
+			text = text % args
+
+		if self._queue_size is not None:
+			self._enqueue(log_level, text)
+		else:
+			if self._closed:
+				raise RuntimeError("Logger is closed")
+			self._log(log_level, text)
 
-	def log(self, log_level: LogLevel, text: str) -> None:
-		self._log(log_level, text)
+	def log_debug(self, text: str | Callable[[], str], *args) -> None:
+		self.log(LogLevel.DEBUG, text, *args)
 
-	def log_info(self, text: str) -> None:
-		self.log(LogLevel.INFO, text)
+	def log_info(self, text: str | Callable[[], str], *args) -> None:
+		self.log(LogLevel.INFO, text, *args)
 
-	def log_warn(self, text: str) -> None:
-		self.log(LogLevel.WARNING, text)
+	def log_warn(self, text: str | Callable[[], str], *args) -> None:
+		self.log(LogLevel.WARNING, text, *args)
 
-	def log_error(self, text: str) -> None:
-		self.log(LogLevel.ERROR, text)
+	def log_error(self, text: str | Callable[[], str], *args) -> None:
+		self.log(LogLevel.ERROR, text, *args)
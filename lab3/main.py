@@ -1,4 +1,4 @@
-from log import Logger, LevelFilter, Formatter, ConsoleHandler, LogLevel, FileLogHandler, SocketHandler
+from log import Logger, LevelFilter, Formatter, ConsoleHandler, LogLevel, FileLogHandler, SocketHandler, OverflowPolicy
 
 logger = Logger(
 	filters=LevelFilter(LogLevel.DEBUG),
@@ -6,4 +6,15 @@ logger = Logger(
 	handlers=[ConsoleHandler(), SocketHandler('localhost', 5000)],
 )
 
-logger.log(LogLevel.INFO, "Hello World")
\ No newline at end of file
+logger.log(LogLevel.INFO, "Hello World")
+logger.close()
+
+with Logger(
+	filters=LevelFilter(LogLevel.INFO),
+	formatters=Formatter(),
+	handlers=ConsoleHandler(),
+	queue_size=1000,
+	overflow=OverflowPolicy.DROP_OLDEST,
+) as queued_logger:
+	for i in range(5):
+		queued_logger.log_info("Queued message %d", i)
@@ -0,0 +1,110 @@
+import multiprocessing
+import threading
+from typing import Callable
+
+from log import ILogHandler, LogLevel
+
+_LEVELS_BY_VALUE: dict[int, LogLevel] = {level.value: level for level in LogLevel}
+
+
+class ProcessLogHandler(ILogHandler):
+	"""
+	Handler for worker processes: records are collected into batches of batch_size records
+	(or for at most flush_interval seconds) and every batch is one item of the collector queue.
+	Records of one process keep their order
+	"""
+	def __init__(self, queue, batch_size: int = 64, flush_interval: float = 0.5):
+		self._queue = queue
+		self._batch_size = batch_size
+		self._records: list[tuple[int, str]] = []
+		self._lock = threading.Lock()
+		self._stop = threading.Event()
+		self._flusher = None
+		if flush_interval > 0:
+			self._flusher = threading.Thread(target=self._flush_loop, args=(flush_interval,), daemon=True)
+			self._flusher.start()
+
+	def _flush_loop(self, flush_interval: float) -> None:
+		while not self._stop.wait(flush_interval):
+			self.flush()
+
+	def handle(self, log_level: LogLevel, text: str) -> None:
+		with self._lock:
+			self._records.append((log_level.value, text))
+			if len(self._records) >= self._batch_size:
+				self._send()
+
+	def handle_batch(self, records: list[tuple[LogLevel, str]]) -> None:
+		with self._lock:
+			self._records.extend((log_level.value, text) for log_level, text in records)
+			if len(self._records) >= self._batch_size:
+				self._send()
+
+	def _send(self) -> None:
+		if self._records:
+			self._queue.put(self._records)
+			self._records = []
+
+	def flush(self) -> None:
+		with self._lock:
+			self._send()
+
+	def close(self) -> None:
+		self._stop.set()
+		self.flush()
+
+
+def _collect(queue, handlers_factory: Callable[[], list[ILogHandler]]) -> None:
+	handlers = handlers_factory()
+	try:
+		while (records := queue.get()) is not None:
+			records = [(_LEVELS_BY_VALUE[level], text) for level, text in records]
+			for handler in handlers:
+				handler.handle_batch(records)
+	finally:
+		for handler in handlers:
+			handler.flush()
+			handler.close()
+
+
+class LogCollector:
+	"""
+	Process that owns the real handlers, worker processes log through handler()
+
+	:param handlers_factory: creates the handlers inside the collector process,
+		must be picklable (a module level function) for the spawn start method
+	"""
+	def __init__(self, handlers_factory: Callable[[], list[ILogHandler]], start_method: str | None = None):
+		context = multiprocessing.get_context(start_method)
+		self._queue = context.Queue()
+		self._process = context.Process(target=_collect, args=(self._queue, handlers_factory), name="LogCollector")
+
+	def start(self) -> None:
+		self._process.start()
+
+	def handler(self) -> ProcessLogHandler:
+		"""
+		:return: handler to pass to a Logger in a worker process (the collector queue is inherited by workers)
+		"""
+		return ProcessLogHandler(self._queue)
+
+	@property
+	def queue(self):
+		return self._queue
+
+	def stop(self) -> None:
+		"""
+		Writes the records already queued, closes the handlers and stops the collector process
+		"""
+		if self._process.is_alive():
+			self._queue.put(None)
+		self._process.join()
+		self._queue.close()
+		self._queue.join_thread()
+
+	def __enter__(self):
+		self.start()
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.stop()
@@ -1,18 +1,213 @@
-import socket
+import argparse
+import asyncio
+import os
+import struct
+import time
 
 HOST = 'localhost'
 PORT = 5000
 
-with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-	s.bind((HOST, PORT))
-	s.listen()
-	print(f"Server on {HOST}:{PORT}...")
+_LENGTH = struct.Struct(">I")
 
-	conn, addr = s.accept()
-	with conn:
-		print(f"Connection established {addr}")
 
-		data = conn.recv(1024)
-		if data:
-			message = data.decode('utf-8')
-			print(f"Message received: {message}")
+class RotatingSink:
+	"""
+	Appends records to a file in batches and rotates it by size: file -> file.1 -> ... -> file.<backup_count>
+	"""
+	def __init__(self, file_path: str, max_bytes: int = 64 * 1024 * 1024, backup_count: int = 5, batch_bytes: int = 256 * 1024):
+		self._file_path = file_path
+		self._max_bytes = max_bytes
+		self._backup_count = backup_count
+		self._batch_bytes = batch_bytes
+		self._buffer = bytearray()
+		self._file = open(file_path, "ab")
+		self._size = self._file.tell()
+		self.writes = 0
+
+	def write(self, records: list[bytes]) -> None:
+		for record in records:
+			self._buffer += record
+			self._buffer += b"\n"
+		if len(self._buffer) >= self._batch_bytes:
+			self.flush()
+
+	def flush(self) -> None:
+		if not self._buffer:
+			return
+		self._file.write(self._buffer)
+		self._file.flush()
+		self.writes += 1
+		self._size += len(self._buffer)
+		self._buffer.clear()
+		if self._size >= self._max_bytes:
+			self._rotate()
+
+	def _rotate(self) -> None:
+		self._file.close()
+		for i in range(self._backup_count - 1, 0, -1):
+			src = f"{self._file_path}.{i}"
+			if os.path.exists(src):
+				os.replace(src, f"{self._file_path}.{i + 1}")
+		if self._backup_count > 0:
+			os.replace(self._file_path, f"{self._file_path}.1")
+		else:
+			os.remove(self._file_path)
+		self._file = open(self._file_path, "ab")
+		self._size = 0
+
+	def close(self) -> None:
+		self.flush()
+		self._file.close()
+
+
+class RecordTooLarge(Exception):
+	def __init__(self, message: str, records: list[bytes]):
+		super().__init__(message)
+		# complete records parsed before the one that is too large
+		self.records = records
+
+
+class Collector:
+	"""
+	Accepts any number of producer connections and parses newline or length (4 byte big endian) framed records.
+	A connection sending a record longer than max_record bytes is closed, so no connection buffers more than that
+	"""
+	def __init__(self, sink: RotatingSink, framing: str = "newline", max_record: int = 1024 * 1024):
+		if framing not in ("newline", "length"):
+			raise ValueError(f"Unknown framing: {framing}")
+		self._sink = sink
+		self._framing = framing
+		self._max_record = max_record
+		self.rejected_connections = 0
+		# peer -> bytes received but not yet parsed into records
+		self._backlog: dict[str, int] = {}
+		self.connections_total = 0
+		self.records = 0
+		self.bytes = 0
+
+	def _parse_lines(self, buffer: bytearray) -> list[bytes]:
+		end = buffer.rfind(b"\n")
+		if end < 0:
+			records = []
+		else:
+			records = bytes(buffer[:end]).split(b"\n")
+			del buffer[:end + 1]
+		if len(buffer) > self._max_record:
+			raise RecordTooLarge(f"no newline in {len(buffer)} bytes", records)
+		return records
+
+	def _parse_length(self, buffer: bytearray) -> list[bytes]:
+		records: list[bytes] = []
+		offset = 0
+		while len(buffer) - offset >= _LENGTH.size:
+			(length,) = _LENGTH.unpack_from(buffer, offset)
+			if length > self._max_record:
+				raise RecordTooLarge(f"record of {length} bytes", records)
+			end = offset + _LENGTH.size + length
+			if end > len(buffer):
+				break
+			records.append(bytes(buffer[offset + _LENGTH.size:end]))
+			offset = end
+		del buffer[:offset]
+		return records
+
+	async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+		peer = "{}:{}".format(*writer.get_extra_info("peername")[:2])
+		parse = self._parse_lines if self._framing == "newline" else self._parse_length
+		buffer = bytearray()
+		self.connections_total += 1
+		self._backlog[peer] = 0
+		try:
+			while data := await reader.read(64 * 1024):
+				self.bytes += len(data)
+				buffer += data
+				records = parse(buffer)
+				if records:
+					self.records += len(records)
+					self._sink.write(records)
+				self._backlog[peer] = len(buffer)
+			if buffer and self._framing == "newline":
+				self.records += 1
+				self._sink.write([bytes(buffer)])
+		except RecordTooLarge as e:
+			if e.records:
+				self.records += len(e.records)
+				self._sink.write(e.records)
+			self.rejected_connections += 1
+			print(f"Closing {peer}: {e}, max record is {self._max_record} bytes")
+		except ConnectionError:
+			pass
+		finally:
+			del self._backlog[peer]
+			writer.close()
+
+	def stats(self) -> dict[str, int]:
+		return {
+			"connections": len(self._backlog),
+			"connections_total": self.connections_total,
+			"records": self.records,
+			"bytes": self.bytes,
+			"backlog_bytes": sum(self._backlog.values()),
+			"max_backlog_bytes": max(self._backlog.values(), default=0),
+			"sink_writes": self._sink.writes,
+			"rejected_connections": self.rejected_connections,
+		}
+
+	def connection_backlog(self) -> dict[str, int]:
+		return dict(self._backlog)
+
+
+async def report(collector: Collector, sink: RotatingSink, interval: float) -> None:
+	last_records = collector.records
+	last_time = time.monotonic()
+	while True:
+		await asyncio.sleep(interval)
+		sink.flush()
+		now = time.monotonic()
+		stats = collector.stats()
+		rate = (stats["records"] - last_records) / (now - last_time)
+		last_records, last_time = stats["records"], now
+		print(
+			f"{rate:10.0f} rec/s  connections {stats['connections']:5d}  records {stats['records']}"
+			f"  backlog {stats['backlog_bytes']} B (max {stats['max_backlog_bytes']} B)  sink writes {stats['sink_writes']}"
+		)
+
+
+async def serve(host: str, port: int, sink: RotatingSink, framing: str, report_interval: float, max_record: int) -> None:
+	collector = Collector(sink, framing, max_record)
+	server = await asyncio.start_server(collector.handle, host, port, backlog=4096)
+	print(f"Server on {host}:{port} ({framing} framing)...")
+	async with server:
+		await asyncio.gather(server.serve_forever(), report(collector, sink, report_interval))
+
+
+def raise_open_files_limit() -> None:
+	try:
+		import resource
+	except ImportError:
+		return
+	soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+	if soft < hard:
+		resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Log collector for SocketHandler")
+	parser.add_argument("--host", default=HOST)
+	parser.add_argument("--port", type=int, default=PORT)
+	parser.add_argument("--framing", choices=["newline", "length"], default="newline")
+	parser.add_argument("--output", default="collected.log")
+	parser.add_argument("--max-bytes", type=int, default=64 * 1024 * 1024)
+	parser.add_argument("--backup-count", type=int, default=5)
+	parser.add_argument("--report-interval", type=float, default=5.0)
+	parser.add_argument("--max-record", type=int, default=1024 * 1024, help="max record size in bytes")
+	args = parser.parse_args()
+
+	raise_open_files_limit()
+	sink = RotatingSink(args.output, args.max_bytes, args.backup_count)
+	try:
+		asyncio.run(serve(args.host, args.port, sink, args.framing, args.report_interval, args.max_record))
+	except KeyboardInterrupt:
+		pass
+	finally:
+		sink.close()
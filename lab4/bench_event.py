@@ -0,0 +1,67 @@
+import time
+from typing import Any, List
+
+from main import Event, EventArgs, EventHandler
+
+
+class ListEvent:
+    """The previous list-based Event, kept as the baseline"""
+    def __init__(self):
+        self._handlers: List[EventHandler] = []
+
+    def __iadd__(self, handler: EventHandler):
+        if handler not in self._handlers:
+            self._handlers.append(handler)
+        return self
+
+    def __isub__(self, handler: EventHandler):
+        if handler in self._handlers:
+            self._handlers.remove(handler)
+        return self
+
+    def invoke(self, sender: Any, args: EventArgs) -> None:
+        for handler in self._handlers:
+            handler.handle(sender, args)
+
+
+class CountingHandler(EventHandler[EventArgs]):
+    calls = 0
+
+    def handle(self, sender: Any, args: EventArgs) -> None:
+        CountingHandler.calls += 1
+
+
+def bench(event_class, n: int) -> tuple:
+    handlers = [CountingHandler() for _ in range(n)]
+    event = event_class()
+    args = EventArgs()
+
+    start = time.perf_counter()
+    for handler in handlers:
+        event += handler
+    subscribe = (time.perf_counter() - start) / n
+
+    invokes = max(1, 100000 // n)
+    start = time.perf_counter()
+    for _ in range(invokes):
+        event.invoke(None, args)
+    invoke = (time.perf_counter() - start) / invokes
+
+    # unsubscribe from the back, the worst case for the linear "in" scan of a list
+    start = time.perf_counter()
+    for handler in reversed(handlers):
+        event -= handler
+    unsubscribe = (time.perf_counter() - start) / n
+
+    return subscribe, unsubscribe, invoke
+
+
+if __name__ == "__main__":
+    print(f"{'handlers':>8} {'event':>6} {'subscribe':>12} {'unsubscribe':>12} {'invoke':>12}")
+    for n in (1, 10, 100, 1000, 10000):
+        for title, event_class in (("list", ListEvent), ("set", Event)):
+            subscribe, unsubscribe, invoke = bench(event_class, n)
+            print(
+                f"{n:>8} {title:>6} {subscribe * 1e9:>9.0f} ns {unsubscribe * 1e9:>9.0f} ns"
+                f" {invoke * 1e6:>9.2f} us"
+            )
@@ -0,0 +1,46 @@
+import time
+from typing import Any
+
+from main import EventHandler, Product, PropertyChangedEventArgs
+
+
+class NullHandler(EventHandler[PropertyChangedEventArgs]):
+    def handle(self, sender: Any, args: PropertyChangedEventArgs) -> None:
+        pass
+
+
+def bench(product: Product, sets: int) -> float:
+    start = time.perf_counter()
+    for i in range(sets):
+        product.price = i
+    return (time.perf_counter() - start) / sets
+
+
+if __name__ == "__main__":
+    sets = 200000
+
+    unobserved = Product("Laptop", 1500.0, 5)
+
+    other_property = Product("Laptop", 1500.0, 5)
+    other_property.on_changed("title", NullHandler())
+
+    same_property = Product("Laptop", 1500.0, 5)
+    same_property.on_changed("price", NullHandler())
+
+    all_properties = Product("Laptop", 1500.0, 5)
+    all_properties.property_changed += NullHandler()
+
+    batched = Product("Laptop", 1500.0, 5)
+    batched.property_changed += NullHandler()
+
+    print(f"{'setter':<36} {'time':>10}")
+    for title, product in (
+            ("nobody subscribed", unobserved),
+            ("handler of another property", other_property),
+            ("handler of this property", same_property),
+            ("handler of all properties", all_properties),
+    ):
+        print(f"{title:<36} {bench(product, sets) * 1e9:>7.0f} ns")
+    with batched.batch_update():
+        batch = bench(batched, sets)
+    print(f"{'handler of all properties, batched':<36} {batch * 1e9:>7.0f} ns")
@@ -1,5 +1,13 @@
+import asyncio
+import inspect
+import sys
+import threading
+import traceback
+import weakref
+from contextlib import contextmanager
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
 from abc import ABC, abstractmethod
-from typing import TypeVar, Generic, List, Any
+from typing import TypeVar, Generic, List, Any, Dict, Tuple, Optional, Callable, Union
 
 class EventArgs:
     pass
@@ -11,23 +19,196 @@ class EventHandler(ABC, Generic[TEventArgs]):
     def handle(self, sender: Any, args: TEventArgs) -> None:
         pass
 
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def _default_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(thread_name_prefix="EventDispatch")
+        return _executor
+
+def _report_handler_error(future: Future) -> None:
+    error = future.exception()
+    if error is not None:
+        print("Exception in a property_changed handler:", file=sys.stderr)
+        traceback.print_exception(error)
+
+# handler of an Event: an EventHandler or a callable(sender, args), e.g. a bound method
+Handler = Union[EventHandler[TEventArgs], Callable[[Any, TEventArgs], None]]
+
+def _is_hashable(obj: Any) -> bool:
+    try:
+        hash(obj)
+    except TypeError:
+        return False
+    return True
+
+class _IdentityKey:
+    # dict key of a handler that can not be hashed (e.g. a @dataclass EventHandler), compares by identity;
+    # a bound method is identified by its object and function, a new method object is made on every access
+    __slots__ = ("_ids",)
+
+    def __init__(self, handler: Handler):
+        if inspect.ismethod(handler):
+            self._ids = (id(handler.__self__), id(handler.__func__))
+        else:
+            self._ids = (id(handler),)
+
+    def __hash__(self) -> int:
+        return hash(self._ids)
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, _IdentityKey) and other._ids == self._ids
+
 class Event(Generic[TEventArgs]):
     def __init__(self):
-        self._handlers: List[EventHandler[TEventArgs]] = []
-
-    def __iadd__(self, handler: EventHandler[TEventArgs]):
-        if handler not in self._handlers:
-            self._handlers.append(handler)
+        # insertion-ordered set: O(1) add/remove, handlers are called in subscription order.
+        # key -> (is weak, callable or weak reference, call .handle of the referent);
+        # the key is the handler, its weak reference or an _IdentityKey if those are not hashable
+        self._handlers: Dict[Any, Tuple[bool, Any, bool]] = {}
+        # immutable copy used by invoke, rebuilt on the first invoke after a change
+        self._snapshot: Optional[Tuple[Tuple[bool, Any, bool], ...]] = ()
+        # keys of weak references whose referents died, removed from _handlers on the next rebuild
+        self._dead: List[Any] = []
+        self._weak_count = 0
+
+    def subscribe(self, handler: Handler, weak: bool = False) -> None:
+        """
+        :param weak: if True, the event does not keep the handler alive,
+            it is dropped once the handler (or the owner of a bound method) is garbage collected
+        """
+        if self._find_key(handler) is not None:
+            return
+        is_handler = isinstance(handler, EventHandler)
+        if not weak:
+            key = handler if _is_hashable(handler) else _IdentityKey(handler)
+            self._handlers[key] = (False, handler.handle if is_handler else handler, False)
+        else:
+            ref_type = weakref.WeakMethod if inspect.ismethod(handler) else weakref.ref
+            key = None
+            if not _is_hashable(handler.__self__ if inspect.ismethod(handler) else handler):
+                key = _IdentityKey(handler)
+            ref = ref_type(handler, self._on_dead_callback(key))
+            self._handlers[ref if key is None else key] = (True, ref, is_handler)
+            self._weak_count += 1
+        self._snapshot = None
+
+    def unsubscribe(self, handler: Handler) -> None:
+        key = self._find_key(handler)
+        if key is not None:
+            if self._handlers.pop(key)[0]:
+                self._weak_count -= 1
+            self._snapshot = None
+
+    def _find_key(self, handler: Handler) -> Any:
+        try:
+            if handler in self._handlers:
+                return handler
+        except TypeError:
+            key = _IdentityKey(handler)
+            if key in self._handlers:
+                return key
+        if not self._weak_count:
+            return None
+        # a dead referent may share its id with the handler, drop it first
+        self._prune()
+        try:
+            ref = weakref.WeakMethod(handler) if inspect.ismethod(handler) else weakref.ref(handler)
+            return ref if ref in self._handlers else None
+        except TypeError:
+            key = _IdentityKey(handler)
+            return key if key in self._handlers else None
+
+    def _on_dead_callback(self, key: Any = None) -> Callable[[weakref.ref], None]:
+        # the callback holds the event weakly, so subscriptions do not keep the event alive either
+        event_ref = weakref.ref(self)
+
+        def on_dead(ref: weakref.ref) -> None:
+            event = event_ref()
+            if event is not None:
+                event._dead.append(ref if key is None else key)
+                event._snapshot = None
+
+        return on_dead
+
+    def _prune(self) -> None:
+        while self._dead:
+            if self._handlers.pop(self._dead.pop(), None) is not None:
+                self._weak_count -= 1
+
+    def __iadd__(self, handler: Handler):
+        self.subscribe(handler)
         return self
 
-    def __isub__(self, handler: EventHandler[TEventArgs]):
-        if handler in self._handlers:
-            self._handlers.remove(handler)
+    def __isub__(self, handler: Handler):
+        self.unsubscribe(handler)
         return self
 
+    def __len__(self) -> int:
+        self._prune()
+        return len(self._handlers)
+
+    def _get_snapshot(self) -> Tuple[Tuple[bool, Any, bool], ...]:
+        snapshot = self._snapshot
+        if snapshot is None:
+            self._prune()
+            snapshot = self._snapshot = tuple(self._handlers.values())
+        return snapshot
+
+    def _targets(self) -> List[Callable[[Any, TEventArgs], Any]]:
+        targets = []
+        for weak, target, is_handler in self._get_snapshot():
+            if weak:
+                target = target()
+                if target is None:
+                    continue
+                if is_handler:
+                    target = target.handle
+            targets.append(target)
+        return targets
+
     def invoke(self, sender: Any, args: TEventArgs) -> None:
-        for handler in self._handlers:
-            handler.handle(sender, args)
+        # handlers subscribed or unsubscribed during dispatch take effect from the next invoke
+        for weak, target, is_handler in self._get_snapshot():
+            if weak:
+                target = target()
+                if target is None:
+                    continue
+                if is_handler:
+                    target = target.handle
+            target(sender, args)
+
+    async def invoke_async(self, sender: Any, args: TEventArgs, max_concurrency: Optional[int] = None) -> None:
+        """
+        Calls the handlers in order; coroutines returned by async handlers run concurrently
+        with asyncio.gather, at most max_concurrency of them at a time
+        """
+        semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+        async def limited(awaitable):
+            async with semaphore:
+                return await awaitable
+
+        awaitables = []
+        for target in self._targets():
+            result = target(sender, args)
+            if inspect.isawaitable(result):
+                awaitables.append(result if semaphore is None else limited(result))
+        if awaitables:
+            await asyncio.gather(*awaitables)
+
+    def invoke_parallel(self, sender: Any, args: TEventArgs, executor: Optional[Executor] = None) -> List[Future]:
+        """
+        Runs every handler in a thread pool and returns without waiting for them.
+        Only for notifications after the fact: handlers can not affect the sender through args
+
+        :param executor: pool to use, a shared pool by default
+        """
+        if executor is None:
+            executor = _default_executor()
+        return [executor.submit(target, sender, args) for target in self._targets()]
 
     def __call__(self, sender: Any, args: TEventArgs) -> None:
         self.invoke(sender, args)
@@ -36,6 +217,13 @@ class PropertyChangedEventArgs(EventArgs):
     def __init__(self, property_name: str):
         self.property_name = property_name
 
+class PropertiesChangedEventArgs(PropertyChangedEventArgs):
+    # single notification for all properties committed by batch_update;
+    # property_name is None ("several properties"), so handlers comparing it with one name skip it
+    def __init__(self, property_names: Tuple[str, ...]):
+        super().__init__(None)
+        self.property_names = property_names
+
 class PropertyChangingEventArgs(EventArgs):
     def __init__(self, property_name: str, old_value: Any, new_value: Any):
         self.property_name = property_name
@@ -45,6 +233,9 @@ class PropertyChangingEventArgs(EventArgs):
 
 class ConsoleLogger(EventHandler[PropertyChangedEventArgs]):
     def handle(self, sender: Any, args: PropertyChangedEventArgs) -> None:
+        if isinstance(args, PropertiesChangedEventArgs):
+            print(f"[INFO] Properties {', '.join(args.property_names)} were successfully changed in {sender.__class__.__name__} object.")
+            return
         print(f"[INFO] Property '{args.property_name}' was successfully changed in {sender.__class__.__name__} object.")
 
 class StrictValidator(EventHandler[PropertyChangingEventArgs]):
@@ -64,20 +255,149 @@ class StrictValidator(EventHandler[PropertyChangingEventArgs]):
         print("   >>> [OK] Validation passed.")
 
 class BaseNotifyPropertyChanged:
+    # if set, property_changed handlers run in this pool and setters do not wait for them,
+    # their exceptions are printed to stderr instead of being raised by the setter;
+    # property_changing validators always run in order on the caller's thread
+    changed_executor: Optional[Executor] = None
+
     def __init__(self):
         self.property_changed = Event[PropertyChangedEventArgs]()
         self.property_changing = Event[PropertyChangingEventArgs]()
-
-    def _set_property(self, name: str, current_value: Any, new_value: Any):
+        # property name -> events of handlers subscribed to that property only,
+        # a name is present only while its event has handlers
+        self._changing_by_name: Dict[str, Event[PropertyChangingEventArgs]] = {}
+        self._changed_by_name: Dict[str, Event[PropertyChangedEventArgs]] = {}
+        # one dict per open batch_update block, innermost last:
+        # property name -> value before the block, in order of the first change
+        self._batch_levels: List[Dict[str, Any]] = []
+
+    def on_changing(self, name: str, handler: Handler, weak: bool = False) -> None:
+        """
+        Subscribes a validator to changes of one property
+        """
+        self._changing_by_name.setdefault(name, Event[PropertyChangingEventArgs]()).subscribe(handler, weak)
+
+    def off_changing(self, name: str, handler: Handler) -> None:
+        self._unsubscribe_by_name(self._changing_by_name, name, handler)
+
+    def on_changed(self, name: str, handler: Handler, weak: bool = False) -> None:
+        """
+        Subscribes a handler to notifications about one property,
+        it receives PropertyChangedEventArgs of that property also for batch updates
+        """
+        self._changed_by_name.setdefault(name, Event[PropertyChangedEventArgs]()).subscribe(handler, weak)
+
+    def off_changed(self, name: str, handler: Handler) -> None:
+        self._unsubscribe_by_name(self._changed_by_name, name, handler)
+
+    @staticmethod
+    def _unsubscribe_by_name(events: Dict[str, Event], name: str, handler: Handler) -> None:
+        event = events.get(name)
+        if event is not None:
+            event.unsubscribe(handler)
+            if not event:
+                del events[name]
+
+    def _notify_changed(self, event: Event[PropertyChangedEventArgs], args: PropertyChangedEventArgs) -> None:
+        if self.changed_executor is not None:
+            for future in event.invoke_parallel(self, args, self.changed_executor):
+                future.add_done_callback(_report_handler_error)
+        else:
+            event.invoke(self, args)
+
+    @staticmethod
+    def _observers(events: Dict[str, Event], name: str) -> Optional[Event]:
+        event = events.get(name)
+        if event is not None and not event:
+            # all its handlers were weak and died: drop the name so the setter takes the fast path again
+            del events[name]
+            return None
+        return event
+
+    def _validate(self, name: str, current_value: Any, new_value: Any) -> bool:
+        changing = self._observers(self._changing_by_name, name)
+        if changing is None and not self.property_changing:
+            return True
         args_changing = PropertyChangingEventArgs(name, current_value, new_value)
         self.property_changing.invoke(self, args_changing)
+        if changing is not None:
+            changing.invoke(self, args_changing)
+        return args_changing.can_change
 
-        if not args_changing.can_change:
+    def _set_property(self, name: str, current_value: Any, new_value: Any):
+        if self._batch_levels:
+            self._batch_levels[-1].setdefault(name, current_value)
+            return new_value
+
+        # nobody observes this property: no event args are created
+        if (
+            name not in self._changing_by_name and name not in self._changed_by_name
+            and not self.property_changing and not self.property_changed
+        ):
+            return new_value
+
+        if not self._validate(name, current_value, new_value):
             return current_value
 
-        self.property_changed.invoke(self, PropertyChangedEventArgs(name))
+        changed = self._observers(self._changed_by_name, name)
+        if self.property_changed or changed is not None:
+            args = PropertyChangedEventArgs(name)
+            self._notify_changed(self.property_changed, args)
+            if changed is not None:
+                self._notify_changed(changed, args)
         return new_value
 
+    @contextmanager
+    def batch_update(self):
+        """
+        Defers notifications for the changes made inside the block. On exit every changed property
+        is validated once with its final value, rejected changes are restored and a single
+        PropertiesChangedEventArgs lists the committed properties.
+        Blocks can be nested, inner blocks are committed with the outermost one.
+        If a block raises, the changes made in it are restored without notifications
+        """
+        self._batch_levels.append({})
+        try:
+            yield self
+        except BaseException:
+            self._end_batch(self._batch_levels.pop(), commit=False)
+            raise
+        pending = self._batch_levels.pop()
+        if self._batch_levels:
+            # the outer block keeps the values from before its own start
+            outer = self._batch_levels[-1]
+            for name, old_value in pending.items():
+                outer.setdefault(name, old_value)
+        else:
+            self._end_batch(pending, commit=True)
+
+    def _end_batch(self, pending: Dict[str, Any], commit: bool) -> None:
+        # properties are stored in "_<name>" attributes
+        committed = []
+        try:
+            for name, old_value in list(pending.items()):
+                if commit and self._validate(name, old_value, getattr(self, "_" + name)):
+                    committed.append(name)
+                else:
+                    setattr(self, "_" + name, old_value)
+                del pending[name]
+        except BaseException:
+            # a validator raised: the properties not validated yet (and the one being validated) are restored,
+            # the ones already committed stay and are notified
+            for name, old_value in pending.items():
+                setattr(self, "_" + name, old_value)
+            self._notify_committed(committed)
+            raise
+        self._notify_committed(committed)
+
+    def _notify_committed(self, committed: List[str]) -> None:
+        if committed and self.property_changed:
+            self._notify_changed(self.property_changed, PropertiesChangedEventArgs(tuple(committed)))
+        for name in committed:
+            changed = self._observers(self._changed_by_name, name)
+            if changed is not None:
+                self._notify_changed(changed, PropertyChangedEventArgs(name))
+
 class User(BaseNotifyPropertyChanged):
     def __init__(self, username: str, age: int, balance: float):
         super().__init__()
@@ -157,4 +477,36 @@ if __name__ == "__main__":
     print("\n4. Attempting to set empty title:")
     product.title = ""
     print(f"Product title: '{product.title}'")
+
+    print("\n5. Weak subscription is dropped with its handler:")
+    temporary_logger = ConsoleLogger()
+    product.property_changed.subscribe(temporary_logger, weak=True)
+    product.stock_qty = 4
+    del temporary_logger
+    product.stock_qty = 3
+    print(f"Stock: {product.stock_qty}, property_changed handlers: {len(product.property_changed)}")
       
+
+    print("\n6. Async handlers run concurrently, sync handlers in order:")
+    async def audit(sender: Any, args: PropertyChangedEventArgs) -> None:
+        await asyncio.sleep(0.01)
+        print(f"   >>> [AUDIT] {args.property_name} changed")
+    product.property_changed += audit
+    asyncio.run(product.property_changed.invoke_async(product, PropertyChangedEventArgs("price"), max_concurrency=4))
+    product.property_changed -= audit
+
+    print("\n7. Batch update is validated on exit and notified once:")
+    product.property_changed += logger
+    with product.batch_update():
+        product.title = "Gaming laptop"
+        product.price = 1300.0
+        product.price = -1.0
+        product.stock_qty = 10
+    print(f"Product: '{product.title}', {product.price}, {product.stock_qty}")
+
+    print("\n8. Subscription to a single property:")
+    product.property_changed -= logger
+    product.property_changing -= validator
+    product.on_changed("price", lambda sender, args: print(f"   >>> [PRICE] '{args.property_name}' changed"))
+    product.stock_qty = 7
+    product.price = 1250.0